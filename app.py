@@ -1,63 +1,212 @@
 # File: app.py
 
-from flask import Flask, request, jsonify
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import os
+import time
+import atexit
+import threading
+import pymongo
+from dotenv import load_dotenv
+from flask import Flask, Response, g, request, jsonify
+
+from batcher import MicroBatcher
+from inference import INFERENCE_BACKEND, MAX_LENGTH, MODEL_PATH, load_sentiment_model, set_num_threads
+from metrics import FORWARD_PROFILER, METRICS
+from prediction_cache import PredictionCache, open_persistent_collection
 
 # --- 1. SETUP ---
 # Inisialisasi aplikasi Flask
 app = Flask(__name__)
+load_dotenv()
 
-# Tentukan path ke model terbaik yang sudah Anda simpan di Google Drive dan unduh
-MODEL_PATH = "./model_terbaik" # Pastikan folder model_terbaik ada di sini
+# Model dibaca dari MODEL_PATH (default ./model_terbaik) dan teks dipotong di
+# MAX_LENGTH token (default 128), keduanya dari inference.py
+# Ukuran potongan (chunk) untuk /analyze_batch dan batas jumlah teks per request
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "64"))
+BULK_MAX_TEXTS = int(os.getenv("BULK_MAX_TEXTS", "5000"))
+MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
+DB_NAME = "db_sentimen"
+# Teks untuk inferensi pemanasan sebelum /healthz melaporkan siap
+WARMUP_TEXTS = ["pemanasan model", "DPR harus mendengar aspirasi rakyat, jangan cuma janji saat kampanye"]
 
 # Muat model dan tokenizer hanya sekali saat aplikasi dimulai
-print("🧠 Memuat model sentimen...")
+print(f"🧠 Memuat model sentimen (backend: {INFERENCE_BACKEND})...")
 try:
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH)
+    sentiment_model = load_sentiment_model(MODEL_PATH, INFERENCE_BACKEND)
     print("✅ Model berhasil dimuat!")
 except Exception as e:
     print(f"❌ Gagal memuat model: {e}")
-    tokenizer = None
-    model = None
+    sentiment_model = None
+
+def predict_batch(texts):
+    """Jalankan satu forward pass untuk sekumpulan teks sekaligus."""
+    return sentiment_model.predict(texts, max_length=MAX_LENGTH)
+
+def predict_bucketed(texts, chunk_size=BULK_CHUNK_SIZE):
+    """Prediksi banyak teks dengan padding per kelompok panjang token."""
+    return sentiment_model.predict_bucketed(texts, max_length=MAX_LENGTH, chunk_size=chunk_size)
+
+# Request /analyze yang datang bersamaan digabung menjadi satu batch
+batcher = MicroBatcher(predict_batch)
 
-# Definisikan label
-labels = ["Negatif", "Netral", "Positif"]
+# Cache prediksi di depan model (tier MongoDB opsional via PREDICTION_CACHE_PERSIST=1)
+prediction_cache = None
+if sentiment_model:
+    # connect=False: koneksi baru dibuka saat dipakai, sehingga aman di-preload
+    # sebelum gunicorn melakukan fork
+    mongo_client = pymongo.MongoClient(MONGO_URI, connect=False) if MONGO_URI else None
+    prediction_cache = PredictionCache(
+        f"{sentiment_model.version}:{MAX_LENGTH}",
+        collection=open_persistent_collection(mongo_client, DB_NAME),
+        lowercase=sentiment_model.lowercase,
+    )
+
+# Status kesiapan per proses: diset setelah inferensi pemanasan berhasil
+model_ready = threading.Event()
+warmup_error = None
+
+def warm_up():
+    """Jalankan inferensi pertama (alokasi thread pool, cache kernel) sebelum menerima trafik."""
+    global warmup_error
+    try:
+        predict_batch(WARMUP_TEXTS[:1])
+        predict_bucketed(WARMUP_TEXTS)
+        model_ready.set()
+    except Exception as e:
+        warmup_error = str(e)
+        print(f"❌ Inferensi pemanasan gagal: {e}")
+
+def init_worker(num_threads=0):
+    """
+    Dipanggil sekali di setiap proses worker (hook post_fork gunicorn): atur
+    jumlah thread inferensi lalu jalankan pemanasan di background.
+    """
+    if num_threads > 0:
+        set_num_threads(num_threads)
+    if FORWARD_PROFILER.enabled:
+        # Satu file profil per worker, ditulis saat proses berhenti
+        atexit.register(FORWARD_PROFILER.write, f"{FORWARD_PROFILER.output}.{os.getpid()}")
+    if sentiment_model:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 # --- 2. BUAT API ENDPOINT ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Latensi dan jumlah request per endpoint untuk /metrics."""
+    started = g.pop("request_started", None)
+    endpoint = request.endpoint or "unknown"
+    if started is not None:
+        METRICS.observe("http_request", time.perf_counter() - started, endpoint=endpoint)
+    METRICS.inc("http_requests", endpoint=endpoint, status=response.status_code)
+    return response
+
 @app.route('/analyze', methods=['POST'])
 def analyze_sentiment():
     """Endpoint untuk menerima teks dan mengembalikan prediksi sentimen."""
-    if not model or not tokenizer:
+    if not sentiment_model:
         return jsonify({"error": "Model tidak tersedia"}), 500
 
     # Ambil data JSON dari request
     data = request.get_json()
-    if not data or 'text' not in data:
-        return jsonify({"error": "Input tidak valid, butuh field 'text'"}), 400
+    if not isinstance(data, dict) or not isinstance(data.get('text'), str):
+        # Teks non-string akan menggagalkan seluruh batch gabungan milik klien lain
+        return jsonify({"error": "Input tidak valid, butuh field 'text' berupa string"}), 400
 
     text_to_analyze = data['text']
 
-    # Lakukan prediksi
+    # Lakukan prediksi (melalui micro-batcher)
     try:
-        inputs = tokenizer(text_to_analyze, return_tensors="pt", truncation=True, max_length=128)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        
-        logits = outputs.logits
-        predicted_class_id = torch.argmax(logits, dim=1).item()
-        predicted_label = labels[predicted_class_id]
-        
+        result = prediction_cache.get(text_to_analyze)
+        if result is None:
+            result = batcher.submit(text_to_analyze)
+            prediction_cache.put(text_to_analyze, result)
+
         # Kembalikan hasil dalam format JSON
         return jsonify({
             "text": text_to_analyze,
-            "sentiment": predicted_label
+            "sentiment": result["sentiment"]
         })
     except Exception as e:
         return jsonify({"error": f"Terjadi kesalahan saat analisis: {e}"}), 500
 
+@app.route('/analyze_batch', methods=['POST'])
+def analyze_sentiment_batch():
+    """Endpoint untuk menganalisis banyak teks sekaligus (mis. dari crawler)."""
+    if not sentiment_model:
+        return jsonify({"error": "Model tidak tersedia"}), 500
+
+    data = request.get_json()
+    texts = data.get('texts') if isinstance(data, dict) else None
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "Input tidak valid, butuh field 'texts' berupa list string"}), 400
+    if len(texts) > BULK_MAX_TEXTS:
+        return jsonify({"error": f"Maksimal {BULK_MAX_TEXTS} teks per request"}), 413
+
+    ids = data.get('ids')
+    if ids is not None and (not isinstance(ids, list) or len(ids) != len(texts)):
+        return jsonify({"error": "Field 'ids' harus berupa list dengan panjang yang sama dengan 'texts'"}), 400
+
+    try:
+        predictions = prediction_cache.predict(texts, predict_bucketed) if texts else []
+    except Exception as e:
+        return jsonify({"error": f"Terjadi kesalahan saat analisis: {e}"}), 500
+
+    results = []
+    for i, (text, prediction) in enumerate(zip(texts, predictions)):
+        item = {"text": text, **prediction}
+        if ids is not None:
+            item["id"] = ids[i]
+        results.append(item)
+    return jsonify({"count": len(results), "results": results})
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness: 200 hanya setelah model dimuat dan inferensi pemanasan selesai di worker ini."""
+    status = {
+        "ready": model_ready.is_set(),
+        "backend": INFERENCE_BACKEND,
+        "model_version": sentiment_model.version if sentiment_model else None,
+        "max_length": MAX_LENGTH,
+        "pid": os.getpid(),
+    }
+    if not sentiment_model:
+        status["error"] = "Model tidak tersedia"
+    elif warmup_error:
+        status["error"] = warmup_error
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route('/stats', methods=['GET'])
+def batcher_stats():
+    """Kedalaman antrean, histogram ukuran batch, latensi per request, hit rate cache, dan rasio padding /analyze_batch."""
+    stats = batcher.snapshot()
+    stats["prediction_cache"] = prediction_cache.snapshot() if prediction_cache else None
+    stats["padding"] = sentiment_model.padding.snapshot() if sentiment_model else None
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Timer & counter per stage (tokenize, forward, request) dalam format teks Prometheus, untuk worker ini."""
+    batch = batcher.snapshot()
+    gauges = {
+        "model_ready": int(model_ready.is_set()),
+        "batcher_queue_depth": batch["queue_depth"],
+        "batcher_avg_batch_size": batch["avg_batch_size"],
+        "batcher_errors": batch["total_errors"],
+    }
+    for p in ("p50", "p95", "p99"):
+        gauges[f"batcher_latency_{p}_ms"] = batch["latency_ms"][p]
+    if prediction_cache:
+        gauges["prediction_cache_hit_rate"] = prediction_cache.snapshot()["hit_rate"]
+    if sentiment_model:
+        gauges["padding_ratio"] = sentiment_model.padding.snapshot()["padding_ratio"]
+    return Response(METRICS.to_prometheus(gauges), mimetype="text/plain; version=0.0.4")
+
 # --- 3. JALANKAN APLIKASI ---
+# Produksi: gunicorn -c gunicorn.conf.py app:app (lihat README)
 if __name__ == '__main__':
     # Jalankan server Flask di port 5000
+    init_worker()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,169 @@
+# File: archiver.py
+
+"""
+Arsip komentar ke file Parquet yang dipartisi per tanggal.
+
+Koleksi `netizen_comments` hanya menyimpan komentar 2 hari terakhir (TTL, lihat
+setup_ttl_index.py). Komentar disalin ke
+`ARCHIVE_URI/comments/date=YYYY-MM-DD/part-<id>.parquet` sebelum kedaluwarsa.
+File dikompresi zstd; sentimen, video, dan topik disimpan sebagai kolom
+dictionary (kategori). Dashboard membaca riwayat lama dari sini dengan pruning
+partisi dan kolom.
+
+`ARCHIVE_URI` boleh berupa folder lokal (default `./archive`) atau URI yang
+didukung pyarrow (mis. `s3://bucket/prefix`). Jika `ARCHIVE_URI` diisi, crawler
+mengarsipkan setiap batch di stage insert (`archive_comments`), langsung dari
+dokumen di memori: komentar yang `published_at`-nya sudah lewat 2 hari bisa
+dihapus TTL sebelum run selesai. Untuk menyalin komentar yang sudah ada di
+koleksi (berdasarkan `_id`, yaitu urutan insert) secara manual:
+    python archiver.py
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pymongo
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from dotenv import load_dotenv
+
+from setup_ttl_index import EXPIRE_AFTER_SECONDS
+
+load_dotenv()
+DB_NAME = "db_sentimen"
+COLLECTION_NAME = "netizen_comments"
+ARCHIVE_STATE_COLLECTION_NAME = "archive_state"
+ARCHIVE_URI = os.getenv("ARCHIVE_URI", "./archive")
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "50000"))
+ARCHIVE_SCHEMA = pa.schema([
+    ("comment_id", pa.string()),
+    ("published_at", pa.timestamp("ms")),
+    ("author", pa.string()),
+    ("comment", pa.string()),
+    ("like_count", pa.int32()),
+    ("sentiment", pa.dictionary(pa.int8(), pa.string())),
+    ("video_id", pa.dictionary(pa.int32(), pa.string())),
+    ("topic", pa.dictionary(pa.int8(), pa.string())),
+])
+CATEGORY_COLUMNS = ("sentiment", "video_id", "topic")
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def _filesystem(uri):
+    """(filesystem, path dasar) untuk folder lokal atau URI seperti s3://bucket/prefix."""
+    if "://" in uri:
+        return fs.FileSystem.from_uri(uri)
+    return fs.LocalFileSystem(), os.path.abspath(uri)
+
+
+def live_start_date(now=None):
+    """Tanggal pertama yang masih utuh di koleksi live; tanggal sebelumnya dibaca dari arsip."""
+    now = now or datetime.utcnow()
+    return (now - timedelta(seconds=EXPIRE_AFTER_SECONDS)).date() + timedelta(days=1)
+
+
+def _to_table(docs):
+    df = pd.DataFrame(docs, columns=ARCHIVE_SCHEMA.names)
+    # Data lama tersimpan sebagai string ISO, data baru sebagai datetime UTC
+    df["published_at"] = pd.to_datetime(df["published_at"], utc=True, errors="coerce").dt.tz_localize(None)
+    df["like_count"] = pd.to_numeric(df["like_count"], errors="coerce").fillna(0).astype("int32")
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype("category")
+    return pa.Table.from_pandas(df, schema=ARCHIVE_SCHEMA, preserve_index=False)
+
+
+def _write_chunk(filesystem, base_path, docs, part_name):
+    """Tulis satu chunk ke partisi tanggalnya masing-masing; nama file deterministik agar run ulang menimpa."""
+    table = _to_table(docs)
+    dates = pc.strftime(table["published_at"], format="%Y-%m-%d")
+    files = 0
+    for date in pc.unique(dates).to_pylist():
+        if date is None:
+            continue  # published_at tidak valid: tidak bisa dipartisi
+        part = table.filter(pc.equal(dates, date))
+        directory = f"{base_path}/comments/date={date}"
+        filesystem.create_dir(directory, recursive=True)
+        pq.write_table(part, f"{directory}/part-{part_name}.parquet", filesystem=filesystem, compression="zstd")
+        files += 1
+    return files
+
+
+def archive_comments(docs, uri=ARCHIVE_URI):
+    """
+    Tulis satu batch dokumen yang baru disimpan crawler (sudah memiliki `_id`).
+    Komentar yang diarsipkan ulang setelah run gagal dibuang saat dibaca.
+    """
+    if not docs:
+        return 0
+    filesystem, base_path = _filesystem(uri)
+    _write_chunk(filesystem, base_path, docs, str(docs[0]["_id"]))
+    return len(docs)
+
+
+def archive_new_comments(db, uri=ARCHIVE_URI, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Salin komentar yang belum diarsipkan (`_id` > watermark di `archive_state`)
+    ke Parquet, per chunk. Watermark maju setelah setiap chunk tertulis, jadi
+    run yang terputus cukup diulang. Mengembalikan jumlah komentar yang diarsipkan.
+    """
+    filesystem, base_path = _filesystem(uri)
+    state = db[ARCHIVE_STATE_COLLECTION_NAME]
+    collection = db[COLLECTION_NAME]
+    doc = state.find_one({"_id": COLLECTION_NAME})
+    last_id = doc["last_id"] if doc else None
+
+    archived = 0
+    projection = {name: 1 for name in ARCHIVE_SCHEMA.names}
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = list(collection.find(query, projection).sort("_id", 1).limit(chunk_size))
+        if not docs:
+            break
+        _write_chunk(filesystem, base_path, docs, str(docs[0]["_id"]))
+        last_id = docs[-1]["_id"]
+        state.update_one({"_id": COLLECTION_NAME}, {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}}, upsert=True)
+        archived += len(docs)
+    return archived
+
+
+def open_history(uri=ARCHIVE_URI):
+    """Dataset arsip, atau None jika belum ada satu pun file."""
+    filesystem, base_path = _filesystem(uri)
+    path = f"{base_path}/comments"
+    if filesystem.get_file_info(path).type == fs.FileType.NotFound:
+        return None
+    return ds.dataset(path, filesystem=filesystem, format="parquet", partitioning=PARTITIONING, schema=ARCHIVE_SCHEMA.append(pa.field("date", pa.string())))
+
+
+def read_history(dataset, start_date, end_date, columns, sentiment=None):
+    """
+    Baca komentar arsip untuk tanggal [start_date, end_date] (inklusif). Hanya
+    partisi tanggal yang cocok dan kolom `columns` yang dibaca dari disk.
+    """
+    condition = (ds.field("date") >= str(start_date)) & (ds.field("date") <= str(end_date))
+    if sentiment and sentiment != "Semua":
+        condition &= ds.field("sentiment") == sentiment
+    # comment_id selalu ikut dibaca: komentar yang diarsipkan ulang (run terputus,
+    # arsip manual setelah crawler) bisa muncul dua kali
+    columns = ["comment_id"] + [c for c in columns if c != "comment_id"]
+    return dataset.to_table(columns=columns, filter=condition).to_pandas().drop_duplicates("comment_id")
+
+
+def main():
+    print(f"🚀 Mengarsipkan komentar baru ke {ARCHIVE_URI}...")
+    client = pymongo.MongoClient(os.getenv("MONGO_CONNECTION_STRING"))
+    try:
+        archived = archive_new_comments(client[DB_NAME])
+        print(f"✅ {archived} komentar diarsipkan.")
+    except Exception as e:
+        print(f"❌ Gagal mengarsipkan komentar: {e}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# File: batcher.py
+
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+# --- KONFIGURASI ---
+# Jumlah maksimum teks yang digabung menjadi satu forward pass
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+# Waktu tunggu maksimum (milidetik) untuk mengumpulkan request sebelum batch dijalankan
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+# Batas antrean agar server tidak menumpuk request tanpa batas saat overload
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "1024"))
+# Jumlah sampel latensi terakhir yang disimpan untuk menghitung persentil
+LATENCY_WINDOW = 2000
+
+
+class BatcherStats:
+    """Statistik sederhana untuk memantau dan menyetel micro-batcher."""
+
+    def __init__(self, max_batch_size):
+        self._lock = threading.Lock()
+        self.batch_size_histogram = {size: 0 for size in range(1, max_batch_size + 1)}
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_errors = 0
+        self._latencies_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def record_batch(self, batch_size, latencies_ms):
+        with self._lock:
+            self.total_batches += 1
+            self.total_requests += batch_size
+            self.batch_size_histogram[batch_size] = self.batch_size_histogram.get(batch_size, 0) + 1
+            self._latencies_ms.extend(latencies_ms)
+
+    def record_error(self, batch_size):
+        with self._lock:
+            self.total_errors += batch_size
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            histogram = {str(k): v for k, v in self.batch_size_histogram.items() if v}
+            total_batches = self.total_batches
+            total_requests = self.total_requests
+            total_errors = self.total_errors
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            idx = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return round(latencies[idx], 2)
+
+        return {
+            "total_requests": total_requests,
+            "total_batches": total_batches,
+            "total_errors": total_errors,
+            "avg_batch_size": round(total_requests / total_batches, 2) if total_batches else 0.0,
+            "batch_size_histogram": histogram,
+            "latency_ms": {
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "samples": len(latencies),
+            },
+        }
+
+
+class MicroBatcher:
+    """
+    Menggabungkan request yang datang bersamaan menjadi satu batch inferensi.
+
+    Setiap pemanggil `submit()` menaruh teksnya ke antrean lalu menunggu. Satu
+    worker thread mengambil teks dari antrean sampai `max_batch_size` tercapai
+    atau `max_wait_ms` habis, menjalankan `predict_fn` sekali untuk seluruh
+    batch, lalu mengembalikan hasilnya ke masing-masing pemanggil.
+
+    `predict_fn` menerima list teks dan harus mengembalikan list hasil dengan
+    urutan yang sama.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, max_queue_size=BATCH_MAX_QUEUE):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self.max_queue_size = max_queue_size
+        self.stats = BatcherStats(self.max_batch_size)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, text, timeout=None):
+        """Masukkan satu teks ke antrean dan tunggu hasil prediksinya."""
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put((text, future, time.perf_counter()), timeout=timeout)
+        except queue.Full:
+            raise RuntimeError("Antrean inferensi penuh, coba lagi nanti")
+        return future.result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # Worker dijalankan secara lazy dan per proses: thread tidak ikut
+        # tersalin saat proses di-fork (mis. worker gunicorn dengan preload).
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _, _ in batch]
+            try:
+                results = self.predict_fn(texts)
+            except Exception as e:
+                self.stats.record_error(len(batch))
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            latencies_ms = []
+            for (_, future, enqueued_at), result in zip(batch, results):
+                future.set_result(result)
+                latencies_ms.append((done - enqueued_at) * 1000)
+            self.stats.record_batch(len(batch), latencies_ms)
+
+    def snapshot(self):
+        """Ringkasan statistik yang siap dikirim sebagai JSON."""
+        data = self.stats.snapshot()
+        data["queue_depth"] = self.queue_depth
+        data["max_batch_size"] = self.max_batch_size
+        data["max_wait_ms"] = self.max_wait_s * 1000
+        return data
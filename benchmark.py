@@ -0,0 +1,278 @@
+# File: benchmark.py
+
+"""
+Benchmark jalur inferensi app.py dan crawler.py dengan korpus komentar
+sintetis berbahasa Indonesia (distribusi panjang mirip komentar YouTube:
+kebanyakan pendek, sesekali sangat panjang).
+
+Mode yang diukur:
+  single      satu teks per forward pass, berurutan (seperti /analyze lama)
+  concurrent  banyak klien paralel, masing-masing satu teks (melalui micro-batcher)
+  bulk        banyak teks sekaligus dengan padding per kelompok panjang (/analyze_batch, crawler)
+
+Contoh:
+    python benchmark.py                                     # model lokal, matriks default
+    python benchmark.py --threads 1 2 4 --max-lengths 128 512
+    python benchmark.py --url http://127.0.0.1:5000         # ukur server app.py yang sedang berjalan
+    python benchmark.py --compare benchmark_results/lama.json benchmark_results/baru.json
+
+Hasil ditulis sebagai JSON ke `benchmark_results/` agar bisa dibandingkan antar-commit.
+"""
+
+import os
+import json
+import time
+import random
+import uuid
+import platform
+import argparse
+import subprocess
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+RESULTS_DIR = "./benchmark_results"
+MODEL_PATH = "./model_terbaik"
+SEED = 20250901
+
+VOCAB = (
+    "dpr rakyat demo tunjangan anggota gaji naik turun bubarkan aset perampasan ruu sahkan polisi aparat "
+    "mahasiswa jalan ricuh damai aman pemerintah presiden menteri korupsi uang negara pajak harga beras "
+    "hidup susah kerja buruh ojol hak suara aspirasi tolong dengar janji kampanye bohong jujur adil "
+    "indonesia jakarta gedung senayan hari ini kemarin besok semoga tetap semangat lawan mantap setuju "
+    "tidak bukan sudah belum harus bisa mau jangan terus kita kami mereka kalian saya pak bu bang "
+    "yang dan di ke dari untuk dengan itu ini juga saja aja banget sih dong deh kok nih tuh loh"
+).split()
+EMOJIS = ["😡", "🔥", "👍", "😂", "🙏", "💪", "😭", "🤬"]
+
+
+def generate_corpus(size, seed=SEED):
+    """Korpus sintetis yang reprodusibel: panjang kata ~ log-normal (median ~10 kata)."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        if rng.random() < 0.05:
+            corpus.append("".join(rng.choices(EMOJIS, k=rng.randint(1, 5))))
+            continue
+        n_words = max(1, min(400, int(rng.lognormvariate(2.3, 0.9))))
+        words = rng.choices(VOCAB, k=n_words)
+        if rng.random() < 0.3:
+            words.append(rng.choice(EMOJIS))
+        text = " ".join(words)
+        corpus.append(text.upper() if rng.random() < 0.1 else text)
+    return corpus
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(latencies_s, n_texts, wall_s):
+    latencies_ms = sorted(l * 1000 for l in latencies_s)
+    return {
+        "texts": n_texts,
+        "wall_seconds": round(wall_s, 3),
+        "texts_per_sec": round(n_texts / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 2),
+            "p95": round(percentile(latencies_ms, 95), 2),
+            "p99": round(percentile(latencies_ms, 99), 2),
+            "mean": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+        },
+    }
+
+
+# --- Target: model lokal (in-process) ---
+class LocalTarget:
+    def __init__(self, model_path, backend, max_length, chunk_size):
+        from inference import load_sentiment_model
+        from batcher import MicroBatcher
+        self.model = load_sentiment_model(model_path, backend)
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.batcher = MicroBatcher(lambda texts: self.model.predict(texts, max_length=self.max_length))
+
+    def single(self, text):
+        return self.model.predict([text], max_length=self.max_length)[0]
+
+    def concurrent(self, text):
+        return self.batcher.submit(text)
+
+    def bulk(self, texts):
+        return self.model.predict_bucketed(texts, max_length=self.max_length, chunk_size=self.chunk_size)
+
+
+def salted(corpus, tag):
+    """
+    Tambahkan penanda unik ke setiap teks. Server app.py menyimpan prediksi di
+    cache, jadi tanpa penanda ini mode berikutnya (dan run berikutnya) hanya
+    mengukur cache hit, bukan inferensi.
+    """
+    return [f"{text} {tag}" for text in corpus]
+
+
+# --- Target: server app.py yang sedang berjalan (HTTP) ---
+class HttpTarget:
+    def __init__(self, url):
+        import requests
+        self.url = url.rstrip("/")
+        self._local = threading.local()
+        self._requests = requests
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = self._requests.Session()
+        return self._local.session
+
+    def single(self, text):
+        response = self._session().post(f"{self.url}/analyze", json={"text": text}, timeout=120)
+        response.raise_for_status()
+        return response.json()
+
+    concurrent = single
+
+    def bulk(self, texts):
+        response = self._session().post(f"{self.url}/analyze_batch", json={"texts": texts}, timeout=600)
+        response.raise_for_status()
+        return response.json()["results"]
+
+
+def run_single(target, corpus):
+    latencies = []
+    started = time.perf_counter()
+    for text in corpus:
+        t0 = time.perf_counter()
+        target.single(text)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, len(corpus), time.perf_counter() - started)
+
+
+def run_concurrent(target, corpus, concurrency):
+    def timed(text):
+        t0 = time.perf_counter()
+        target.concurrent(text)
+        return time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, corpus))
+    result = summarize(latencies, len(corpus), time.perf_counter() - started)
+    result["concurrency"] = concurrency
+    return result
+
+
+def run_bulk(target, corpus, request_size):
+    latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(corpus), request_size):
+        t0 = time.perf_counter()
+        target.bulk(corpus[start:start + request_size])
+        latencies.append(time.perf_counter() - t0)
+    result = summarize(latencies, len(corpus), time.perf_counter() - started)
+    result["request_size"] = request_size
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(baseline_path, candidate_path):
+    """Tampilkan perubahan texts/sec dan p95 antara dua file hasil benchmark."""
+    with open(baseline_path) as f:
+        baseline = {r["key"]: r for r in json.load(f)["results"]}
+    with open(candidate_path) as f:
+        candidate = {r["key"]: r for r in json.load(f)["results"]}
+
+    print(f"{'konfigurasi':<48} {'texts/s lama':>12} {'baru':>10} {'Δ':>8}   {'p95 lama':>9} {'baru':>9}")
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        delta = (new["texts_per_sec"] - old["texts_per_sec"]) / old["texts_per_sec"] * 100 if old["texts_per_sec"] else 0.0
+        flag = "  ⚠️" if delta < -10 else ""
+        print(f"{key:<48} {old['texts_per_sec']:>12.1f} {new['texts_per_sec']:>10.1f} {delta:>+7.1f}%   "
+              f"{old['latency_ms']['p95']:>9.1f} {new['latency_ms']['p95']:>9.1f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inferensi sentimen (single, concurrent, bulk).")
+    parser.add_argument("--url", help="Ukur server app.py yang sedang berjalan, bukan model lokal")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "fp32"))
+    parser.add_argument("--modes", nargs="+", default=["single", "concurrent", "bulk"], choices=["single", "concurrent", "bulk"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, os.cpu_count() or 1], help="torch.set_num_threads (mode lokal)")
+    parser.add_argument("--max-lengths", nargs="+", type=int, default=[128, 512])
+    parser.add_argument("--corpus-size", type=int, default=500)
+    parser.add_argument("--single-size", type=int, default=100, help="Jumlah teks untuk mode single (paling lambat)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--request-size", type=int, default=500, help="Jumlah teks per request bulk")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", help="Path file JSON hasil (default: benchmark_results/<waktu>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("LAMA", "BARU"), help="Bandingkan dua file hasil lalu keluar")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    corpus = generate_corpus(args.corpus_size)
+    word_counts = sorted(len(t.split()) for t in corpus)
+    print(f"📚 Korpus sintetis: {len(corpus)} teks, median {percentile(word_counts, 50)} kata, p95 {percentile(word_counts, 95)} kata")
+
+    results = []
+    # Penanda per run: setiap mode HTTP memakai teks yang belum pernah dilihat server
+    run_nonce = uuid.uuid4().hex[:8]
+    if args.url:
+        configs = [(None, None)]
+    else:
+        configs = [(threads, max_length) for threads in args.threads for max_length in args.max_lengths]
+
+    for threads, max_length in configs:
+        if args.url:
+            target = HttpTarget(args.url)
+            label = "http"
+        else:
+            import torch
+            torch.set_num_threads(threads)
+            target = LocalTarget(args.model, args.backend, max_length, args.chunk_size)
+            label = f"{args.backend} threads={threads} max_len={max_length}"
+        for text in (salted(corpus[:args.warmup], f"#{run_nonce}warmup") if args.url else corpus[:args.warmup]):
+            target.single(text)
+
+        for mode in args.modes:
+            print(f"⏱️  {label} mode={mode}...")
+            texts = salted(corpus, f"#{run_nonce}{mode}") if args.url else corpus
+            if mode == "single":
+                result = run_single(target, texts[:args.single_size])
+            elif mode == "concurrent":
+                result = run_concurrent(target, texts, args.concurrency)
+            else:
+                result = run_bulk(target, texts, args.request_size)
+            result.update({"key": f"{label} mode={mode}", "mode": mode, "threads": threads, "max_length": max_length})
+            results.append(result)
+            print(f"   {result['texts_per_sec']:.1f} teks/dtk, p50 {result['latency_ms']['p50']} ms, "
+                  f"p95 {result['latency_ms']['p95']} ms, p99 {result['latency_ms']['p99']} ms")
+
+    report = {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "commit": git_commit(),
+        "target": args.url or f"{args.model} ({args.backend})",
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "corpus": {"size": len(corpus), "seed": SEED, "cache_salt": run_nonce if args.url else None},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S}_{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Hasil disimpan di {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 # File: checker.py (Versi Baru dengan Logika Ganda)
 
 import os
+import time
+import argparse
 import pymongo
+from collections import Counter
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import smtplib
 
+from metrics import METRICS, write_run_summary
+from rollup import ROLLUP_COLLECTION_NAME, hour_bucket, segment_window_counts
+
 # --- KONFIGURASI ---
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
@@ -26,6 +32,16 @@ ABSOLUTE_THRESHOLD_PERCENT = 70.0 # Batas ambang jika sentimen negatif > 70%
 TIME_WINDOW_HOURS = 1
 BASELINE_HOURS = 24
 
+# Pemicu per topik dan per video hanya dievaluasi jika volumenya cukup, agar
+# segelintir komentar di video kecil tidak memicu peringatan
+MIN_SEGMENT_COMMENTS = 30   # Minimal komentar di jendela saat ini
+MIN_SEGMENT_BASELINE = 100  # Minimal komentar pembanding untuk pemicu lonjakan
+
+# Mode watch: jeda antar-evaluasi saat tidak ada komentar baru, dan jarak minimum
+# antar-email untuk jenis peringatan yang sama
+WATCH_POLL_SECONDS = float(os.getenv("CHECKER_POLL_SECONDS", "30"))
+ALERT_COOLDOWN_MINUTES = int(os.getenv("ALERT_COOLDOWN_MINUTES", "60"))
+
 def send_email_alert(subject, body):
     if not EMAIL_PASSWORD:
         print("WARNING: GMAIL_APP_PASSWORD tidak diatur. Tidak bisa mengirim email.")
@@ -43,45 +59,24 @@ def send_email_alert(subject, body):
         print(f"❌ Gagal mengirim notifikasi email: {e}")
         return False
 
-def check_sentiment_spike():
-    print("🚀 Memulai pengecekan sentimen...")
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-
-    now = datetime.utcnow()
-    current_window_start = now - timedelta(hours=TIME_WINDOW_HOURS)
-    baseline_window_start = now - timedelta(hours=BASELINE_HOURS)
+def negative_percent(counts):
+    total = sum(counts.values())
+    return (counts.get('Negatif', 0) / total * 100) if total > 0 else 0
 
-    # 1. Hitung metrik di jendela waktu saat ini (1 jam terakhir)
-    pipeline_current = [
-        {"$match": {"published_at": {"$gte": current_window_start}}},
-        {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
-    ]
-    results_current = list(collection.aggregate(pipeline_current))
-    counts_current = {res['_id']: res['count'] for res in results_current}
-    total_current = sum(counts_current.values())
-    neg_percent_current = (counts_current.get('Negatif', 0) / total_current * 100) if total_current > 0 else 0
-
-    # 2. Hitung metrik di jendela waktu pembanding (24 jam sebelumnya)
-    pipeline_baseline = [
-        {"$match": {"published_at": {"$gte": baseline_window_start, "$lt": current_window_start}}},
-        {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
-    ]
-    results_baseline = list(collection.aggregate(pipeline_baseline))
-    counts_baseline = {res['_id']: res['count'] for res in results_baseline}
-    total_baseline = sum(counts_baseline.values())
-    neg_percent_baseline = (counts_baseline.get('Negatif', 0) / total_baseline * 100) if total_baseline > 0 else 0
-
-    print(f"   - Sentimen Negatif (1 jam terakhir): {neg_percent_current:.2f}%")
-    print(f"   - Rata-rata Sentimen Negatif (24 jam sebelumnya): {neg_percent_baseline:.2f}%")
-
-    # 3. Cek kedua kondisi pemicu
-    alert_reason = None
+def evaluate_alert(counts_current, counts_baseline):
+    """
+    Terapkan kedua kondisi pemicu pada hitungan sentimen jendela saat ini dan
+    jendela pembanding. Mengembalikan dict berisi persentase, kenaikan, serta
+    `kind` ('absolute'/'spike') dan `reason` jika peringatan harus dikirim.
+    """
+    neg_percent_current = negative_percent(counts_current)
+    neg_percent_baseline = negative_percent(counts_baseline)
+    result = {"neg_current": neg_percent_current, "neg_baseline": neg_percent_baseline, "increase": None, "kind": None, "reason": None}
 
     # Kondisi 1: Batas Ambang Absolut
     if neg_percent_current >= ABSOLUTE_THRESHOLD_PERCENT:
-        alert_reason = (
+        result["kind"] = "absolute"
+        result["reason"] = (
             f"Sentimen negatif telah melampaui batas ambang {ABSOLUTE_THRESHOLD_PERCENT}%.\n\n"
             f"- Persentase Negatif (1 Jam Terakhir): {neg_percent_current:.2f}%"
         )
@@ -89,29 +84,271 @@ def check_sentiment_spike():
     # Kondisi 2: Lonjakan Persentase
     elif neg_percent_baseline > 0:
         increase = ((neg_percent_current - neg_percent_baseline) / neg_percent_baseline) * 100
-        print(f"   - Kenaikan terhitung: {increase:.2f}%")
+        result["increase"] = increase
         if increase >= SPIKE_THRESHOLD_INCREASE:
-            alert_reason = (
+            result["kind"] = "spike"
+            result["reason"] = (
                 f"Terdeteksi lonjakan sentimen negatif sebesar {increase:.2f}%.\n\n"
                 f"- Persentase Negatif (1 Jam Terakhir): {neg_percent_current:.2f}%\n"
                 f"- Rata-rata Negatif (24 Jam Sebelumnya): {neg_percent_baseline:.2f}%"
             )
+    return result
 
-    # 4. Kirim notifikasi jika salah satu kondisi terpenuhi
-    if alert_reason:
-        print(f"🚨 PERINGATAN! {alert_reason.splitlines()[0]}")
-        subject = "Peringatan Dini: Sentimen Negatif Tinggi Terdeteksi"
-        body = (
-            f"Sistem mendeteksi aktivitas sentimen negatif yang signifikan.\n\n"
-            f"Penyebab Peringatan:\n{alert_reason}\n\n"
-            f"Disarankan untuk segera memeriksa dashboard untuk analisis lebih lanjut."
-        )
-        send_email_alert(subject, body)
+def evaluate_segments(segments, label):
+    """
+    Evaluasi pemicu untuk setiap topik/video yang lolos batas volume minimum.
+    Mengembalikan list alasan peringatan, masing-masing diberi label segmennya.
+    """
+    reasons = []
+    for key, windows in sorted(segments.items(), key=lambda item: str(item[0])):
+        current, baseline = windows["current"], windows["baseline"]
+        if sum(current.values()) < MIN_SEGMENT_COMMENTS:
+            continue
+        # Tanpa pembanding yang cukup, hanya batas ambang absolut yang dicek
+        if sum(baseline.values()) < MIN_SEGMENT_BASELINE:
+            baseline = {}
+        result = evaluate_alert(current, baseline)
+        if result["reason"]:
+            reasons.append(f"[{label}: {key}] {result['reason']}")
+    return reasons
+
+def send_sentiment_alert(alert_reason):
+    print(f"🚨 PERINGATAN! {alert_reason.splitlines()[0]}")
+    METRICS.inc("alerts")
+    subject = "Peringatan Dini: Sentimen Negatif Tinggi Terdeteksi"
+    body = (
+        f"Sistem mendeteksi aktivitas sentimen negatif yang signifikan.\n\n"
+        f"Penyebab Peringatan:\n{alert_reason}\n\n"
+        f"Disarankan untuk segera memeriksa dashboard untuk analisis lebih lanjut."
+    )
+    return send_email_alert(subject, body)
+
+def check_sentiment_spike():
+    print("🚀 Memulai pengecekan sentimen...")
+    started_at = datetime.utcnow()
+    client = pymongo.MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    # Hitungan dibaca dari rollup per jam (diisi crawler), bukan memindai komentar mentah
+    rollup = db[ROLLUP_COLLECTION_NAME]
+
+    # Jendela waktu mengikuti batas jam penuh agar cocok dengan bucket rollup
+    now = hour_bucket(datetime.utcnow())
+    current_window_start = now - timedelta(hours=TIME_WINDOW_HOURS)
+    baseline_window_start = now - timedelta(hours=BASELINE_HOURS)
+
+    # 1. Hitung metrik jendela saat ini (1 jam terakhir) dan pembanding (24 jam
+    #    sebelumnya) untuk keseluruhan data, per topik, dan per video sekaligus
+    with METRICS.timer("stage", stage="aggregation"):
+        segments = segment_window_counts(rollup, baseline_window_start, current_window_start, now)
+    overall = segments["global"].get(None, {"current": {}, "baseline": {}})
+
+    # 2. Cek kedua kondisi pemicu secara keseluruhan
+    result = evaluate_alert(overall["current"], overall["baseline"])
+    print(f"   - Sentimen Negatif (1 jam terakhir): {result['neg_current']:.2f}%")
+    print(f"   - Rata-rata Sentimen Negatif (24 jam sebelumnya): {result['neg_baseline']:.2f}%")
+    if result["increase"] is not None:
+        print(f"   - Kenaikan terhitung: {result['increase']:.2f}%")
+
+    # 3. Cek pemicu yang sama per topik dan per video
+    reasons = [result["reason"]] if result["reason"] else []
+    reasons += evaluate_segments(segments["topic"], "Topik")
+    reasons += evaluate_segments({f"https://youtu.be/{video_id}": w for video_id, w in segments["video"].items()}, "Video")
+    print(f"   - Dievaluasi: {len(segments['topic'])} topik, {len(segments['video'])} video.")
+
+    # 4. Kirim satu notifikasi berisi semua kondisi yang terpenuhi
+    if reasons:
+        with METRICS.timer("stage", stage="email"):
+            send_sentiment_alert("\n\n".join(reasons))
     else:
         print("   - Kondisi normal, tidak ada pemicu peringatan yang aktif.")
         
     client.close()
+    write_run_summary(
+        "checker", started_at,
+        neg_current=result["neg_current"], neg_baseline=result["neg_baseline"], increase=result["increase"],
+        topics=len(segments["topic"]), videos=len(segments["video"]), alerts=len(reasons),
+    )
     print("🏁 Pengecekan selesai.")
 
+# =======================================================================
+# MODE WATCH: evaluasi berkelanjutan dengan jendela geser di memori
+# =======================================================================
+_EPOCH = datetime(1970, 1, 1)
+
+def _minute_index(value):
+    return int((value - _EPOCH).total_seconds() // 60)
+
+class SlidingSentimentWindow:
+    """
+    Hitungan sentimen per menit untuk jendela saat ini (`TIME_WINDOW_HOURS`
+    terakhir) dan jendela pembanding (sisa `BASELINE_HOURS`), berdasarkan
+    `published_at`. Total kedua jendela dijaga berjalan (running total),
+    sehingga menambah komentar dan mengevaluasi pemicu bernilai O(1); saat
+    waktu maju, bucket menit berpindah dari jendela saat ini ke pembanding
+    lalu dibuang.
+    """
+
+    def __init__(self, now, current_hours=TIME_WINDOW_HOURS, total_hours=BASELINE_HOURS):
+        self.current_minutes = current_hours * 60
+        self.total_minutes = total_hours * 60
+        self.now_minute = _minute_index(now)
+        self.buckets = {}
+        self.current = Counter()
+        self.baseline = Counter()
+
+    def add(self, published_at, sentiment, count=1):
+        """Tambahkan komentar; komentar di luar 24 jam terakhir diabaikan."""
+        minute = min(_minute_index(published_at), self.now_minute)
+        age = self.now_minute - minute
+        if age >= self.total_minutes:
+            return False
+        self.buckets.setdefault(minute, Counter())[sentiment] += count
+        (self.current if age < self.current_minutes else self.baseline)[sentiment] += count
+        return True
+
+    def advance(self, now):
+        target = _minute_index(now)
+        if target - self.now_minute >= self.total_minutes:
+            self.buckets.clear()
+            self.current.clear()
+            self.baseline.clear()
+            self.now_minute = target
+            return
+        while self.now_minute < target:
+            self.now_minute += 1
+            leaving_current = self.buckets.get(self.now_minute - self.current_minutes)
+            if leaving_current:
+                self.current.subtract(leaving_current)
+                self.baseline.update(leaving_current)
+            expired = self.buckets.pop(self.now_minute - self.total_minutes, None)
+            if expired:
+                self.baseline.subtract(expired)
+
+class AlertCooldown:
+    """Cegah email berulang: jenis peringatan yang sama baru dikirim lagi setelah cooldown."""
+
+    def __init__(self, minutes=ALERT_COOLDOWN_MINUTES):
+        self.cooldown = timedelta(minutes=minutes)
+        self.last_sent = {}
+
+    def should_send(self, kind, now):
+        last = self.last_sent.get(kind)
+        return last is None or now - last >= self.cooldown
+
+    def mark_sent(self, kind, now):
+        self.last_sent[kind] = now
+
+def seed_window(collection, window, now):
+    """Isi jendela dari komentar 24 jam terakhir; mengembalikan `_id` terbesar yang sudah dihitung."""
+    since = now - timedelta(hours=BASELINE_HOURS)
+    # Posisi awal = dokumen terbaru, agar polling tidak memindai seluruh koleksi
+    # (termasuk dokumen lama tanpa TTL) jika 24 jam terakhir kosong
+    newest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    last_id = newest["_id"] if newest else None
+    for doc in collection.find({"published_at": {"$gte": since}}, {"published_at": 1, "sentiment": 1}):
+        _count_document(window, doc)
+        if last_id is None or doc["_id"] > last_id:
+            last_id = doc["_id"]
+    return last_id
+
+def _count_document(window, doc):
+    published_at, sentiment = doc.get("published_at"), doc.get("sentiment")
+    if isinstance(published_at, datetime) and sentiment:
+        window.add(published_at, sentiment)
+
+def _documents_after(collection, last_id):
+    query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+    return collection.find(query, {"published_at": 1, "sentiment": 1}).sort("_id", 1)
+
+def _new_documents(collection, poll_seconds, last_id):
+    """
+    Hasilkan komentar baru (atau None saat tidak ada perubahan selama
+    `poll_seconds`). Memakai change stream jika tersedia (replica set /
+    Atlas), jika tidak polling koleksi berdasarkan `_id`. Stream yang terputus
+    atau error jaringan tidak menghentikan proses: stream dibuka ulang dan
+    dilanjutkan dari `_id` terakhir yang sudah dihasilkan.
+    """
+    use_stream = True
+    while use_stream:
+        try:
+            with collection.watch([{"$match": {"operationType": "insert"}}], max_await_time_ms=int(poll_seconds * 1000)) as stream:
+                print("   Memantau komentar baru lewat change stream.")
+                # Komentar yang masuk sebelum stream (seeding, atau stream sebelumnya
+                # terputus) diambil sekali lewat _id
+                for doc in _documents_after(collection, last_id):
+                    last_id = doc["_id"]
+                    yield doc
+                while stream.alive:
+                    change = stream.try_next()
+                    if change is None:
+                        yield None
+                        continue
+                    doc = change["fullDocument"]
+                    if last_id is None or doc["_id"] > last_id:
+                        last_id = doc["_id"]
+                        yield doc
+        except pymongo.errors.OperationFailure as e:
+            print(f"   Change stream tidak tersedia ({e.code}); beralih ke polling setiap {poll_seconds} detik.")
+            use_stream = False
+        except pymongo.errors.PyMongoError as e:
+            METRICS.inc("watch_errors")
+            print(f"⚠️ Change stream terputus ({e}); dibuka ulang dalam {poll_seconds} detik.")
+            time.sleep(poll_seconds)
+
+    while True:
+        try:
+            for doc in _documents_after(collection, last_id):
+                last_id = doc["_id"]
+                yield doc
+        except pymongo.errors.PyMongoError as e:
+            METRICS.inc("watch_errors")
+            print(f"⚠️ Polling gagal ({e}); dicoba lagi dalam {poll_seconds} detik.")
+        yield None
+        time.sleep(poll_seconds)
+
+def watch_sentiment_spikes(poll_seconds=WATCH_POLL_SECONDS):
+    """Jalankan checker terus-menerus: pemicu dievaluasi setiap ada komentar baru."""
+    print("🚀 Memulai checker mode watch...")
+    client = pymongo.MongoClient(MONGO_URI)
+    collection = client[DB_NAME][COLLECTION_NAME]
+    now = started_at = datetime.utcnow()
+    window = SlidingSentimentWindow(now)
+    with METRICS.timer("stage", stage="seed"):
+        last_id = seed_window(collection, window, now)
+    print(f"   Jendela awal: {sum(window.current.values())} komentar (1 jam), {sum(window.baseline.values())} komentar (pembanding).")
+    cooldown = AlertCooldown()
+    active_kind = None
+
+    try:
+        for doc in _new_documents(collection, poll_seconds, last_id):
+            now = datetime.utcnow()
+            window.advance(now)
+            if doc is not None:
+                _count_document(window, doc)
+                METRICS.inc("documents")
+
+            with METRICS.timer("stage", stage="evaluate"):
+                result = evaluate_alert(window.current, window.baseline)
+            if result["kind"] != active_kind:
+                if result["kind"] is None:
+                    print(f"   [{now:%H:%M}] Kondisi kembali normal ({result['neg_current']:.2f}% negatif).")
+                active_kind = result["kind"]
+            if result["kind"] and cooldown.should_send(result["kind"], now):
+                send_sentiment_alert(result["reason"])
+                cooldown.mark_sent(result["kind"], now)
+    except KeyboardInterrupt:
+        print("\n   Dihentikan oleh pengguna.")
+    finally:
+        client.close()
+        write_run_summary("checker_watch", started_at, poll_seconds=poll_seconds)
+        print("🏁 Checker mode watch selesai.")
+
 if __name__ == "__main__":
-    check_sentiment_spike()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Cek lonjakan sentimen negatif dan kirim peringatan email.")
+    parser.add_argument("--watch", action="store_true", help="Jalankan terus-menerus dan evaluasi setiap ada komentar baru")
+    parser.add_argument("--poll-seconds", type=float, default=WATCH_POLL_SECONDS, help="Interval polling/evaluasi mode watch")
+    args = parser.parse_args()
+    if args.watch:
+        watch_sentiment_spikes(args.poll_seconds)
+    else:
+        check_sentiment_spike()
@@ -0,0 +1,195 @@
+# File: crawl_pipeline.py
+
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+from metrics import METRICS
+
+# --- KONFIGURASI ---
+BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "500"))     # Ukuran batch inferensi & insert
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "20"))  # Maks. halaman/batch yang menunggu per antrean
+
+_DONE = object()  # Penanda akhir aliran data antar-stage
+
+
+class StageStats:
+    """Penghitung throughput untuk satu stage pipeline (waktunya juga dicatat di METRICS)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    @contextmanager
+    def timed(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.busy_seconds += elapsed
+            METRICS.observe("stage", elapsed, stage=self.name)
+
+    def to_dict(self):
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+    def summary(self):
+        rate = self.items_out / self.busy_seconds if self.busy_seconds else 0.0
+        return (f"{self.name:<10} masuk {self.items_in:>6}  keluar {self.items_out:>6}  "
+                f"batch {self.batches:>4}  sibuk {self.busy_seconds:7.2f} dtk  ({rate:,.0f} item/dtk)")
+
+
+class CrawlPipeline:
+    """
+    Pipeline streaming: fetch -> dedup -> inferensi -> insert.
+
+    Setiap stage berjalan di thread sendiri dan terhubung lewat antrean
+    berukuran tetap, sehingga memori tetap konstan berapa pun
+    `TARGET_TOTAL_COMMENTS`: jika stage hilir lambat, antrean penuh dan
+    stage hulu (termasuk thread fetch) ikut menunggu (backpressure).
+
+    Fungsi yang disuntikkan:
+      dedup_fn(comments)  -> list komentar yang belum ada di database
+      predict_fn(texts)   -> list hasil prediksi {'sentiment': ...} dengan urutan sama
+      insert_fn(docs)     -> jumlah dokumen yang benar-benar tersimpan
+    """
+
+    def __init__(self, fetcher, dedup_fn, predict_fn, insert_fn, batch_size=BATCH_SIZE, queue_size=PIPELINE_QUEUE_SIZE):
+        self.fetcher = fetcher
+        self.dedup_fn = dedup_fn
+        self.predict_fn = predict_fn
+        self.insert_fn = insert_fn
+        self.batch_size = batch_size
+        self._pages = queue.Queue(maxsize=queue_size)
+        self._fresh = queue.Queue(maxsize=queue_size)
+        self._predicted = queue.Queue(maxsize=2)
+        self.stats = {name: StageStats(name) for name in ("fetch", "dedup", "inference", "insert")}
+        self.errors = []
+        self.wall_seconds = 0.0
+        self._fetch_lock = threading.Lock()
+
+    def _fail(self, stage, error):
+        print(f"   ❌ Stage {stage} gagal: {error}. Pipeline dihentikan.")
+        self.errors.append((stage, error))
+        self.fetcher.stop()
+
+    # --- Stage 1: fetch (dijalankan oleh thread pool CommentFetcher) ---
+    def _on_page(self, comments):
+        stats = self.stats["fetch"]
+        with self._fetch_lock:  # Dipanggil dari banyak thread fetch
+            stats.items_in += len(comments)
+            stats.items_out += len(comments)
+            stats.batches += 1
+        self._pages.put(comments)  # Memblokir jika dedup tertinggal
+
+    # --- Stage 2: dedup ---
+    def _dedup_stage(self):
+        stats = self.stats["dedup"]
+        while (page := self._pages.get()) is not _DONE:
+            if self.errors:
+                continue  # Kuras antrean agar thread fetch tidak macet
+            stats.items_in += len(page)
+            try:
+                with stats.timed():
+                    fresh = self.dedup_fn(page)
+            except Exception as e:
+                self._fail("dedup", e)
+                continue
+            stats.items_out += len(fresh)
+            stats.batches += 1
+            if fresh:
+                self._fresh.put(fresh)
+        self._fresh.put(_DONE)
+
+    # --- Stage 3: inferensi batch ---
+    def _predict_batch(self, batch):
+        stats = self.stats["inference"]
+        docs = [doc for doc in batch if doc.get('comment')]
+        with stats.timed():
+            results = self.predict_fn([str(doc['comment']) for doc in docs])
+        for doc, result in zip(docs, results):
+            doc['sentiment'] = result['sentiment']
+        stats.items_out += len(docs)
+        stats.batches += 1
+        self._predicted.put(docs)
+
+    def _inference_stage(self):
+        stats = self.stats["inference"]
+        pending = []
+        while (comments := self._fresh.get()) is not _DONE:
+            if self.errors:
+                continue
+            stats.items_in += len(comments)
+            pending.extend(comments)
+            try:
+                while len(pending) >= self.batch_size:
+                    batch, pending = pending[:self.batch_size], pending[self.batch_size:]
+                    self._predict_batch(batch)
+            except Exception as e:
+                self._fail("inference", e)
+        if pending and not self.errors:
+            try:
+                self._predict_batch(pending)
+            except Exception as e:
+                self._fail("inference", e)
+        self._predicted.put(_DONE)
+
+    # --- Stage 4: insert ---
+    def _insert_stage(self):
+        stats = self.stats["insert"]
+        while (docs := self._predicted.get()) is not _DONE:
+            if self.errors or not docs:
+                continue
+            stats.items_in += len(docs)
+            try:
+                with stats.timed():
+                    saved = self.insert_fn(docs)
+            except Exception as e:
+                self._fail("insert", e)
+                continue
+            stats.items_out += saved
+            stats.batches += 1
+            print(f"   ✅ Berhasil menyimpan {saved} dokumen (total {stats.items_out}).")
+
+    def run(self, video_ids):
+        workers = [
+            threading.Thread(target=self._dedup_stage, name="pipeline-dedup", daemon=True),
+            threading.Thread(target=self._inference_stage, name="pipeline-inference", daemon=True),
+            threading.Thread(target=self._insert_stage, name="pipeline-insert", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+
+        started = time.perf_counter()
+        try:
+            with self.stats["fetch"].timed():
+                self.fetcher.run(video_ids, self._on_page)
+        finally:
+            self._pages.put(_DONE)
+            for worker in workers:
+                worker.join()
+            self.wall_seconds = time.perf_counter() - started
+        return self.stats["insert"].items_out
+
+    def summary(self):
+        """Statistik per stage sebagai dict untuk ringkasan run JSON."""
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "errors": [f"{stage}: {error}" for stage, error in self.errors],
+            "stages": {name: stats.to_dict() for name, stats in self.stats.items()},
+        }
+
+    def print_summary(self):
+        print(f"📊 Throughput per stage (total waktu {self.wall_seconds:.2f} dtk):")
+        for stats in self.stats.values():
+            print(f"   {stats.summary()}")
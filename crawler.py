@@ -1,16 +1,26 @@
-# File: crawler.py (Versi Optimasi Memori)
+# File: crawler.py (Versi Pipeline Streaming)
 
 import os
 import sys
 import traceback
-import pandas as pd
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import pymongo
-import transformers
-import gc # Garbage Collector
+import requests
+from pymongo.errors import BulkWriteError
+
+from crawl_pipeline import CrawlPipeline
+from metrics import METRICS, write_run_summary
+from prediction_cache import PredictionCache, open_persistent_collection
+from rollup import COUNTED_COLLECTION_NAME, ROLLUP_COLLECTION_NAME, apply_rollup, ensure_counted_indexes, mark_counted
+from term_index import TERM_COLLECTION_NAME, apply_term_counts
+from topics import OTHER_TOPIC, classify_topic, search_query
+from youtube_fetcher import (
+    CRAWL_STATE_COLLECTION_NAME, QUOTA_COLLECTION_NAME, SEARCH_COST, CommentFetcher, CrawlState, QuotaExceeded, QuotaTracker,
+    RateLimiter, execute_with_retry,
+)
 
 # =======================================================================
 # KONFIGURASI & SETUP
@@ -23,147 +33,246 @@ if not API_KEY or not MONGO_URI:
     print("❌ FATAL: Pastikan YOUTUBE_API_KEY dan MONGO_CONNECTION_STRING ada di file .env")
     sys.exit(1)
 
-SEARCH_QUERY = '"tunjangan dpr" | "demo dpr" | "demo rusuh indonesia" | "bubarkan dpr" | "perampasan aset"'
+SEARCH_QUERY = search_query() # Frasa topik dari topics.py digabung dengan OR
 MAX_SEARCH_RESULTS = 50
 SEARCH_PERIOD_DAYS = 30
 TARGET_TOTAL_COMMENTS = 10000
 DB_NAME = "db_sentimen"
 COLLECTION_NAME = "netizen_comments"
 BATCH_SIZE = 500 # Ukuran batch untuk diproses, sesuaikan jika perlu
+# Opsional: jika diisi (mis. http://127.0.0.1:5000), analisis sentimen dikirim ke
+# endpoint /analyze_batch milik app.py alih-alih memuat model di crawler.
+SENTIMENT_API_URL = os.getenv("SENTIMENT_API_URL")
 
-# ... Fungsi search_videos dan scrape_youtube_comments tetap sama ...
-def search_videos(youtube, query, max_results, period_days):
+def search_videos(youtube, query, max_results, period_days, limiter, quota):
+    """Cari video relevan; mengembalikan dict video_id -> topik (dari judul dan deskripsi)."""
     print(f"🔎 Mencari video dengan kata kunci: '{query}'...")
     search_after_date = (datetime.now() - timedelta(days=period_days)).isoformat("T") + "Z"
     try:
         request = youtube.search().list(part="snippet", q=query, type="video", order="relevance", maxResults=max_results, regionCode="ID", relevanceLanguage="id", publishedAfter=search_after_date)
-        response = request.execute()
-        video_ids = [item['id']['videoId'] for item in response.get('items', [])]
-        if video_ids: print(f"✅ Ditemukan {len(video_ids)} ID video relevan.")
+        response = execute_with_retry(request, limiter, quota, SEARCH_COST)
+        videos = {}
+        for item in response.get('items', []):
+            snippet = item.get('snippet', {})
+            videos[item['id']['videoId']] = classify_topic(f"{snippet.get('title', '')} {snippet.get('description', '')}")
+        if videos: print(f"✅ Ditemukan {len(videos)} ID video relevan.")
         else: print("⚠️ Tidak ada video yang ditemukan.")
-        return video_ids
+        return videos
+    except QuotaExceeded as e:
+        print(f"❌ FATAL: {e}.")
+        return {}
     except HttpError as e:
-        if "quotaExceeded" in str(e): print("❌ FATAL: Kuota YouTube API harian telah habis.")
-        else: print(f"❌ ERROR HttpError saat mencari video: {e}")
-        return []
-
-def scrape_youtube_comments(youtube, video_ids, target_count):
-    print(f"💬 Mengambil komentar dari {len(video_ids)} video (target: {target_count} komentar)...")
-    comments_list = []
-    for video_id in video_ids:
-        if len(comments_list) >= target_count: break
+        print(f"❌ ERROR HttpError saat mencari video: {e}")
+        return {}
+
+# --- FUNGSI YANG DIUBAH ---
+
+def analyze_via_api(texts):
+    """Kirim satu batch teks ke endpoint /analyze_batch dan kembalikan hasil prediksinya."""
+    response = requests.post(f"{SENTIMENT_API_URL.rstrip('/')}/analyze_batch", json={"texts": texts}, timeout=300)
+    response.raise_for_status()
+    return [{'sentiment': r['sentiment'], 'probabilities': r.get('probabilities', {})} for r in response.json()['results']]
+
+def api_model_version():
+    """Versi model yang sedang dilayani API (dari /healthz), untuk namespace cache prediksi."""
+    response = requests.get(f"{SENTIMENT_API_URL.rstrip('/')}/healthz", timeout=30)
+    status = response.json()
+    if not status.get("model_version"):
+        raise RuntimeError(f"API belum siap atau model tidak tersedia (HTTP {response.status_code})")
+    return f"{status['model_version']}:{status.get('max_length')}"
+
+def load_predictor(client):
+    """
+    Siapkan fungsi prediksi (model lokal atau API batch) yang dibungkus cache
+    prediksi. Mengembalikan (predict_fn, prediction_cache, padding_stats) atau
+    (None, None, None) jika model gagal dimuat; padding_stats None di mode API.
+    """
+    # Muat model AI sekali saja (tidak perlu jika memakai API batch)
+    if SENTIMENT_API_URL:
         try:
-            request = youtube.commentThreads().list(part='snippet', videoId=video_id, maxResults=100, textFormat='plainText', order='relevance')
-            while request:
-                response = request.execute()
-                for item in response['items']:
-                    comment_snippet = item['snippet']['topLevelComment']['snippet']
-                    comments_list.append({'comment_id': item['id'], 'author': comment_snippet.get('authorDisplayName'), 'comment': comment_snippet.get('textDisplay'), 'published_at': comment_snippet.get('publishedAt'), 'like_count': comment_snippet.get('likeCount', 0), 'video_id': video_id})
-                if 'nextPageToken' in response and len(comments_list) < target_count:
-                    request = youtube.commentThreads().list_next(request, response)
-                else: request = None
+            # Namespace mengikuti versi model di balik API, sehingga prediksi lama tidak
+            # dipakai lagi setelah model diganti di URL yang sama
+            model_version = api_model_version()
         except Exception as e:
-            print(f"   [Peringatan] Gagal mengambil komentar dari video {video_id}: {e}")
-            continue
-    print(f"✅ Berhasil mengumpulkan {len(comments_list)} komentar.")
-    return pd.DataFrame(comments_list)
+            print(f"❌ ERROR: Gagal membaca versi model dari API. Proses dibatalkan. {e}")
+            return None, None, None
+        print(f"   Analisis sentimen memakai API batch di {SENTIMENT_API_URL} (model: {model_version}).")
+        raw_predict_fn = analyze_via_api
+        cache_namespace, lowercase = f"api:{model_version}", False
+        padding_stats = None
+    else:
+        # Diimpor di sini agar mode API batch tidak perlu memuat torch/transformers sama sekali
+        from inference import INFERENCE_BACKEND, MAX_LENGTH, MODEL_PATH, load_sentiment_model
+        try:
+            # Model, label (id2label), dan batas token yang sama dengan app.py
+            sentiment_analyzer = load_sentiment_model(MODEL_PATH, INFERENCE_BACKEND)
+            print(f"   Model AI {MODEL_PATH} berhasil dimuat (backend: {INFERENCE_BACKEND}, max_length: {MAX_LENGTH}).")
+        except Exception as e:
+            print(f"❌ ERROR: Gagal memuat model AI. Proses dibatalkan. {e}")
+            return None, None, None
 
-# --- FUNGSI YANG DIUBAH ---
+        # Teks di-tokenize dulu, diurutkan per panjang token, lalu diprediksi per
+        # chunk; hasil dikembalikan dalam urutan semula sebelum insert
+        def raw_predict_fn(texts):
+            return sentiment_analyzer.predict_bucketed(texts, max_length=MAX_LENGTH)
+        cache_namespace, lowercase = f"{sentiment_analyzer.version}:{MAX_LENGTH}", sentiment_analyzer.lowercase
+        padding_stats = sentiment_analyzer.padding
+
+    # Komentar duplikat (spam, emoji, "bubarkan dpr") tidak perlu diprediksi ulang
+    prediction_cache = PredictionCache(cache_namespace, collection=open_persistent_collection(client, DB_NAME), lowercase=lowercase)
+    return (lambda texts: prediction_cache.predict(texts, raw_predict_fn)), prediction_cache, padding_stats
 
-def process_and_save_in_batches(df, client):
+def crawl_and_process(youtube_factory, videos, client, limiter, quota):
     """
-    Fungsi baru untuk memproses analisis sentimen dan menyimpan ke MongoDB
-    secara batch untuk menghemat memori.
+    Ambil komentar, buang yang sudah ada, analisis sentimen, dan simpan ke
+    MongoDB sebagai satu pipeline streaming dengan memori konstan.
+    `videos` adalah dict video_id -> topik dari `search_videos`. Mengembalikan
+    statistik run untuk ringkasan JSON (dict kosong jika model gagal dimuat).
     """
-    if df.empty:
-        print("ℹ️ Tidak ada data baru untuk diproses.")
-        return
+    video_ids = list(videos)
+    print("🧠 Menyiapkan pipeline streaming...")
+    predict_fn, prediction_cache, padding_stats = load_predictor(client)
+    if predict_fn is None:
+        return {}
 
-    print("🧠 Memulai pemrosesan data dalam batch...")
-    
-    # 1. Muat model AI sekali saja
-    try:
-        sentiment_analyzer = transformers.pipeline(
-            "sentiment-analysis",
-            model="mdhugol/indonesia-bert-sentiment-classification",
-            device=-1
-        )
-        print("   Model AI berhasil dimuat.")
-    except Exception as e:
-        print(f"❌ ERROR: Gagal memuat model AI. Proses dibatalkan. {e}")
-        return
-
-    # 2. Ambil semua ID yang ada di DB sekali saja (jika DB besar, ini juga bisa dioptimalkan)
-    db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-    print("   Mengambil ID komentar yang sudah ada dari database...")
-    existing_ids = {doc.get('comment_id') for doc in collection.find({}, {'comment_id': 1}) if 'comment_id' in doc}
-    print(f"   Ditemukan {len(existing_ids)} ID yang sudah ada.")
-
-    # 3. Filter data yang belum ada di database
-    df_new = df[~df['comment_id'].isin(existing_ids)]
-    if df_new.empty:
-        print("ℹ️ Semua data yang di-crawl sudah ada di database.")
-        return
-        
-    print(f"   Ditemukan {len(df_new)} komentar baru untuk diproses.")
-    
-    # 4. Proses dalam batch
-    total_saved = 0
-    for start in range(0, len(df_new), BATCH_SIZE):
-        end = start + BATCH_SIZE
-        df_batch = df_new.iloc[start:end]
-        
-        print(f"\n--- Memproses batch {start+1}-{min(end, len(df_new))} dari {len(df_new)} ---")
-        
-        # Analisis sentimen untuk batch ini
-        texts = df_batch['comment'].dropna().astype(str).tolist()
-        if not texts:
-            continue
-            
-        results = sentiment_analyzer(texts, truncation=True, max_length=512)
-        
-        def map_label(label):
-            if label == 'LABEL_2': return "Negatif"
-            if label == 'LABEL_0': return "Positif"
-            return "Netral"
-        
-        sentiments = [map_label(result['label']) for result in results]
-        df_batch['sentiment'] = sentiments
-
-        # Simpan batch ini ke MongoDB
-        records_to_insert = df_batch.to_dict('records')
-        if records_to_insert:
-            collection.insert_many(records_to_insert, ordered=False)
-            total_saved += len(records_to_insert)
-            print(f"   ✅ Berhasil menyimpan {len(records_to_insert)} dokumen.")
-            
-        # Hapus variabel dan jalankan garbage collector untuk membersihkan memori
-        del df_batch, texts, results, sentiments
-        gc.collect()
-
-    print(f"\n✅ Pemrosesan batch selesai. Total {total_saved} dokumen baru disimpan.")
+    collection = client[DB_NAME][COLLECTION_NAME]
+
+    counted_collection = client[DB_NAME][COUNTED_COLLECTION_NAME]
+    # TTL index dibuat di sini juga agar deployment yang hanya menjalankan crawler
+    # (tanpa setup_indexes.py) tidak menumpuk catatan tanpa batas
+    ensure_counted_indexes(counted_collection)
+
+    # Dedup memakai `counted_comments` (_id = comment_id, lihat rollup.py) dan koleksi
+    # utama (unique index 'comment_id'): hanya ID kandidat tiap halaman yang dicek, jadi
+    # biaya tidak tumbuh seiring ukuran DB. `counted_comments` bertahan lebih lama dari
+    # TTL 2 hari, sehingga komentar lama yang diambil ulang (gap, token kedaluwarsa)
+    # tetap dibuang; koleksi utama menutup komentar yang belum tercatat di sana
+    # (data sebelum `counted_comments` ada, dihitung lewat backfill atau migrasi).
+    def dedup_fn(comments):
+        candidate_ids = [c['comment_id'] for c in comments]
+        existing_ids = {doc['_id'] for doc in counted_collection.find({'_id': {'$in': candidate_ids}}, {'_id': 1})}
+        remaining_ids = [i for i in candidate_ids if i not in existing_ids]
+        if remaining_ids:
+            existing_ids.update(doc['comment_id'] for doc in collection.find({'comment_id': {'$in': remaining_ids}}, {'comment_id': 1, '_id': 0}))
+        return [c for c in comments if c['comment_id'] not in existing_ids]
+
+    rollup_collection = client[DB_NAME][ROLLUP_COLLECTION_NAME]
+    term_collection = client[DB_NAME][TERM_COLLECTION_NAME]
+    archive_comments = None
+    if os.getenv("ARCHIVE_URI"):
+        from archiver import archive_comments
+
+    def insert_fn(docs):
+        # Topik video ikut disimpan per komentar untuk deteksi lonjakan per topik di checker
+        for doc in docs:
+            doc['topic'] = videos.get(doc['video_id'], OTHER_TOPIC)
+        try:
+            with METRICS.timer("stage", stage="mongo_insert"):
+                collection.insert_many(docs, ordered=False)
+            inserted = docs
+        except BulkWriteError as e:
+            # Duplikat yang lolos dedup (mis. run paralel) ditolak unique index; sisanya tetap tersimpan
+            write_errors = e.details.get('writeErrors', [])
+            if any(err.get('code') != 11000 for err in write_errors):
+                raise
+            failed = {err['index'] for err in write_errors}
+            inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+        # Arsip Parquet ditulis dari batch di memori, sebelum TTL sempat menghapus
+        # komentar yang sudah lebih dari 2 hari; termasuk duplikat di koleksi utama
+        # agar batch yang gagal diarsipkan ikut ditulis saat diambil ulang
+        if archive_comments is not None:
+            with METRICS.timer("stage", stage="archive"):
+                archive_comments(docs)
+        # Rollup per jam dan indeks kata hanya menghitung dokumen yang berhasil dicatat
+        # di `counted_comments` oleh run ini (run paralel tidak menghitung dua kali)
+        claimed = None
+        try:
+            with METRICS.timer("stage", stage="mark_counted"):
+                claimed = mark_counted(counted_collection, docs)
+            with METRICS.timer("stage", stage="rollup"):
+                apply_rollup(rollup_collection, claimed)
+            with METRICS.timer("stage", stage="term_index"):
+                apply_term_counts(term_collection, claimed)
+        except Exception:
+            # Batalkan batch ini agar bisa diulang utuh: tanpa catatan dan dokumen utama,
+            # komentarnya lolos dedup lagi di run berikutnya
+            rollback_ids = [doc['comment_id'] for doc in (claimed if claimed is not None else inserted)]
+            counted_collection.delete_many({'_id': {'$in': rollback_ids}})
+            collection.delete_many({'_id': {'$in': [doc['_id'] for doc in inserted]}})
+            raise
+        return len(inserted)
+
+    # Watermark per video: hanya komentar yang lebih baru dari run sebelumnya yang diambil
+    crawl_state = CrawlState(collection=client[DB_NAME][CRAWL_STATE_COLLECTION_NAME])
+    crawl_state.load(video_ids)
+
+    print(f"💬 Mengambil komentar dari {len(video_ids)} video (target: {TARGET_TOTAL_COMMENTS} komentar)...")
+    fetcher = CommentFetcher(youtube_factory, TARGET_TOTAL_COMMENTS, limiter=limiter, quota=quota, state=crawl_state)
+    pipeline = CrawlPipeline(fetcher, dedup_fn, predict_fn, insert_fn, batch_size=BATCH_SIZE)
+    total_saved = pipeline.run(video_ids)
+
+    # Watermark baru disimpan hanya jika semua komentar yang diambil sudah tersimpan
+    if not pipeline.errors:
+        crawl_state.flush()
+
+    print(f"\n✅ Pipeline selesai. {fetcher.collected} komentar diambil dari {fetcher.pages} halaman, "
+          f"{total_saved} dokumen baru disimpan (kuota terpakai: {quota.used} unit, sisa: {quota.remaining}).")
+    print(f"   {fetcher.caught_up_videos}/{len(video_ids)} video sudah mutakhir sampai watermark.")
+    pipeline.print_summary()
+    cache_stats = prediction_cache.snapshot()
+    print(f"   Cache prediksi: hit rate {cache_stats['hit_rate']:.1%} "
+          f"({cache_stats['memory_hits']} memori, {cache_stats['persistent_hits']} persisten, {cache_stats['misses']} inferensi).")
+    padding = None
+    if padding_stats is not None and padding_stats.texts:
+        padding = padding_stats.snapshot()
+        inference_stats = pipeline.stats["inference"]
+        rate = inference_stats.items_out / inference_stats.busy_seconds if inference_stats.busy_seconds else 0.0
+        print(f"   Padding inferensi: {padding['padding_ratio']:.1%} token padding setelah diurutkan per panjang "
+              f"(tanpa pengurutan: {padding['unsorted_padding_ratio']:.1%}), {padding['texts']} teks model, {rate:,.0f} teks/dtk.")
+
+    return {
+        "videos": len(video_ids),
+        "caught_up_videos": fetcher.caught_up_videos,
+        "comments_fetched": fetcher.collected,
+        "pages": fetcher.pages,
+        "documents_saved": total_saved,
+        "pipeline": pipeline.summary(),
+        "prediction_cache": cache_stats,
+        "padding": padding,
+    }
 
 def main():
     """Fungsi utama untuk mengorkestrasi seluruh proses."""
     mongo_client = None
+    started_at = datetime.utcnow()
+    run_stats = {"status": "ok"}
     try:
-        youtube = build('youtube', 'v3', developerKey=API_KEY)
+        # Objek klien googleapiclient tidak thread-safe, jadi tiap thread membuat kliennya sendiri
+        def youtube_factory():
+            return build('youtube', 'v3', developerKey=API_KEY, cache_discovery=False)
+
         mongo_client = pymongo.MongoClient(MONGO_URI)
-        
-        video_ids = search_videos(youtube, SEARCH_QUERY, MAX_SEARCH_RESULTS, SEARCH_PERIOD_DAYS)
-        
-        if video_ids:
-            df_comments = scrape_youtube_comments(youtube, video_ids, TARGET_TOTAL_COMMENTS)
-            # Panggil fungsi pemrosesan batch yang baru
-            process_and_save_in_batches(df_comments, mongo_client)
+        limiter = RateLimiter()
+        quota = QuotaTracker(collection=mongo_client[DB_NAME][QUOTA_COLLECTION_NAME])
+        print(f"   Sisa kuota YouTube API hari ini: {quota.remaining} unit.")
+
+        try:
+            videos = search_videos(youtube_factory(), SEARCH_QUERY, MAX_SEARCH_RESULTS, SEARCH_PERIOD_DAYS, limiter, quota)
+
+            if videos:
+                run_stats.update(crawl_and_process(youtube_factory, videos, mongo_client, limiter, quota))
+        finally:
+            run_stats["quota_used"] = quota.used
+            quota.flush()
 
     except Exception as e:
         print(f"❌ Terjadi kesalahan fatal di proses utama: {e}")
         traceback.print_exc()
+        run_stats.update(status="error", error=str(e))
     finally:
         if mongo_client:
             mongo_client.close()
+        write_run_summary("crawler", started_at, **run_stats)
         print("🏁 Proses crawler selesai.")
 
 if __name__ == "__main__":
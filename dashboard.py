@@ -5,12 +5,19 @@ import pandas as pd
 import requests
 import pymongo
 import os
+import math
+import tempfile
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from sklearn.feature_extraction.text import CountVectorizer
 from datetime import datetime, timedelta
 
+# wordcloud, matplotlib, scikit-learn, dan archiver (pyarrow) diimpor di panel
+# yang memakainya agar KPI tampil tanpa menunggu library tersebut dimuat
+import dashboard_data
+from stale_cache import clear_all as clear_stale_caches, stale_while_revalidate
+from rollup import ROLLUP_COLLECTION_NAME
+from term_index import STOP_WORDS, TERM_COLLECTION_NAME
+
 # --- 1. KONFIGURASI & SETUP ---
 st.set_page_config(page_title="Dashboard Analisis Isu Publik", page_icon="📈", layout="wide")
 
@@ -19,26 +26,169 @@ MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
 DB_NAME = "db_sentimen"
 COLLECTION_NAME = "netizen_comments"
 API_URL = "http://127.0.0.1:5000/analyze"
+BATCH_API_URL = "http://127.0.0.1:5000/analyze_batch"
+# "aggregate": KPI, grafik & tabel dihitung oleh agregasi MongoDB sesuai filter
+# "full": seluruh koleksi dimuat ke pandas lalu dihitung di sisi dashboard (perilaku lama)
+# "auto" (default): "aggregate", kecuali masih ada published_at string yang belum
+# dimigrasi (agregasi hanya membaca Date), lalu "full" sampai migrate_published_at.py dijalankan
+DASHBOARD_MODE = os.getenv("DASHBOARD_MODE", "auto")
+TABLE_PAGE_SIZES = [25, 50, 100, 250]
+WORDCLOUD_MAX_WORDS = 200
+# Umur data sebelum dimuat ulang di latar; sampai selesai, data lama tetap ditampilkan
+CACHE_TTL_SECONDS = 600
 
 # --- 2. FUNGSI-FUNGSI BANTUAN ---
-@st.cache_data(ttl=600) # Cache data selama 10 menit
+@stale_while_revalidate(ttl=CACHE_TTL_SECONDS)
 def load_data_from_mongo():
+    """
+    Seluruh koleksi dalam bentuk ringkas (tanpa teks komentar, lihat
+    dashboard_data.load_compact_frame). Error tidak ditangkap di sini agar
+    refresh latar yang gagal tetap memakai data lama.
+    """
+    client = pymongo.MongoClient(MONGO_URI)
     try:
-        client = pymongo.MongoClient(MONGO_URI)
-        db = client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        data = list(collection.find({}, {"_id": 0})) # Ambil semua data tanpa _id
+        return dashboard_data.load_compact_frame(client[DB_NAME][COLLECTION_NAME])
+    finally:
         client.close()
-        if data:
-            df = pd.DataFrame(data)
-            df['published_at'] = pd.to_datetime(df['published_at'])
-            return df
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_comment_texts(comment_ids):
+    """Teks komentar untuk tuple comment_id; hanya dipanggil untuk baris yang ditampilkan."""
+    return dashboard_data.get_comment_texts_by_id(get_collection(), comment_ids)
+
+def with_comment_text(rows):
+    """Sisipkan kolom `comment` ke potongan DataFrame mode full sebelum ditampilkan."""
+    rows = rows.copy()
+    rows.insert(rows.columns.get_loc("author") + 1, "comment", load_comment_texts(tuple(rows["comment_id"])).values)
+    return rows
+
+@st.cache_resource
+def get_mongo_client():
+    return pymongo.MongoClient(MONGO_URI)
+
+def get_collection():
+    return get_mongo_client()[DB_NAME][COLLECTION_NAME]
+
+def get_rollup_collection():
+    """Rollup per jam, atau None jika belum pernah diisi (crawler/backfill)."""
+    rollup = get_mongo_client()[DB_NAME][ROLLUP_COLLECTION_NAME]
+    return rollup if rollup.find_one({}, {"_id": 1}) else None
+
+@st.cache_resource(ttl=600)
+def get_history():
+    """
+    Dataset arsip Parquet untuk tanggal yang sudah kedaluwarsa, atau None jika
+    `ARCHIVE_URI` tidak diisi atau arsip belum ada.
+    """
+    if not os.getenv("ARCHIVE_URI"):
+        return None
+    try:
+        import archiver
+        return archiver.open_history()
     except Exception as e:
-        st.error(f"Gagal terhubung ke MongoDB: {e}")
-    return pd.DataFrame()
+        st.warning(f"Arsip komentar tidak dapat dibuka: {e}")
+        return None
+
+def get_term_collection():
+    """Indeks kata harian, atau None jika belum pernah diisi (crawler/backfill)."""
+    terms = get_mongo_client()[DB_NAME][TERM_COLLECTION_NAME]
+    return terms if terms.find_one({}, {"_id": 1}) else None
+
+@stale_while_revalidate(ttl=CACHE_TTL_SECONDS)
+def has_legacy_dates():
+    return dashboard_data.has_string_dates(get_collection())
+
+@stale_while_revalidate(ttl=CACHE_TTL_SECONDS)
+def load_filter_options():
+    """Rentang tanggal dan daftar sentimen untuk sidebar (mode agregasi)."""
+    collection = get_collection()
+    min_date, max_date = dashboard_data.get_date_bounds(collection, get_rollup_collection())
+    return min_date, max_date, dashboard_data.get_sentiment_options(collection)
+
+@stale_while_revalidate(ttl=CACHE_TTL_SECONDS)
+def load_summary(start_date, end_date, sentiment):
+    """Jumlah komentar per sentimen (KPI & pie chart); kecil dan cepat, jadi dimuat paling awal."""
+    rollup_collection = get_rollup_collection()
+    if rollup_collection is not None:
+        return dashboard_data.get_sentiment_counts_from_rollup(rollup_collection, start_date, end_date, sentiment)
+    match = dashboard_data.build_match(start_date, end_date, sentiment)
+    return dashboard_data.get_sentiment_counts(get_collection(), match)
+
+@stale_while_revalidate(ttl=CACHE_TTL_SECONDS)
+def load_aggregates(start_date, end_date, sentiment):
+    """Tren harian dan komentar populer untuk filter yang dipilih."""
+    collection = get_collection()
+    rollup_collection = get_rollup_collection()
+    match = dashboard_data.build_match(start_date, end_date, sentiment)
+    if rollup_collection is not None:
+        sentiment_over_time = dashboard_data.get_daily_trend_from_rollup(rollup_collection, start_date, end_date, sentiment)
+    else:
+        sentiment_over_time = dashboard_data.get_daily_trend(collection, match)
+    return {
+        "sentiment_over_time": sentiment_over_time,
+        "top_liked": dashboard_data.get_top_liked_with_history(collection, get_history(), start_date, end_date, sentiment, limit=10),
+    }
+
+@stale_while_revalidate(ttl=CACHE_TTL_SECONDS)
+def load_term_panels(start_date, end_date, sentiment):
+    """
+    Bigram teratas dan frekuensi kata untuk komentar negatif, dijumlahkan dari
+    indeks kata harian. None jika indeks belum tersedia.
+    """
+    term_collection = get_term_collection()
+    if term_collection is None:
+        return None
+    if sentiment not in ('Semua', 'Negatif'):
+        return [], {}
+    top_topics = dashboard_data.get_top_terms(term_collection, start_date, end_date, 'Negatif', n=2, top_k=15)
+    unigrams = dashboard_data.get_top_terms(term_collection, start_date, end_date, 'Negatif', n=1, top_k=WORDCLOUD_MAX_WORDS * 2)
+    from wordcloud import STOPWORDS
+    word_frequencies = dict([(w, c) for w, c in unigrams if w not in STOPWORDS][:WORDCLOUD_MAX_WORDS])
+    return top_topics, word_frequencies
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_negative_comments(start_date, end_date, sentiment, include_legacy=False):
+    return dashboard_data.get_comment_texts_with_history(
+        get_collection(), get_history(), start_date, end_date, sentiment, target="Negatif", include_legacy=include_legacy,
+    )
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def count_filtered_comments(start_date, end_date, sentiment):
+    match = dashboard_data.build_match(start_date, end_date, sentiment)
+    return dashboard_data.count_comments(get_collection(), match)
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_comments_page(start_date, end_date, sentiment, sort_by, page, page_size):
+    match = dashboard_data.build_match(start_date, end_date, sentiment)
+    return dashboard_data.get_comments_page(get_collection(), match, sort_by, page, page_size)
+
+@contextmanager
+def export_filtered_comments(start_date, end_date, sentiment, fmt):
+    """
+    Tulis hasil filter ke file sementara per chunk, lalu berikan jumlah baris dan
+    handle file yang terbuka (bukan isinya) untuk tombol unduh. File dihapus
+    setelah blok `with` selesai.
+    """
+    match = dashboard_data.build_match(start_date, end_date, sentiment)
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        rows = dashboard_data.export_comments(get_collection(), match, path, fmt)
+        with open(path, "rb") as f:
+            yield rows, f
+    finally:
+        os.remove(path)
+
+def make_wordcloud(frequencies=None, text=None):
+    """Gambar word cloud dari frekuensi kata (indeks kata) atau teks mentah."""
+    from wordcloud import WordCloud
+    wordcloud = WordCloud(width=800, height=400, background_color="white", collocations=False)
+    wordcloud = wordcloud.generate_from_frequencies(frequencies) if frequencies else wordcloud.generate(text)
+    return wordcloud.to_array()
 
 def get_top_ngrams(corpus, n=2, top_k=20):
-    vec = CountVectorizer(ngram_range=(n, n), stop_words=['di', 'dan', 'yang', 'ini', 'itu', 'ke', 'dari', 'dengan', 'untuk']).fit(corpus)
+    from sklearn.feature_extraction.text import CountVectorizer
+    vec = CountVectorizer(ngram_range=(n, n), stop_words=STOP_WORDS).fit(corpus)
     bag_of_words = vec.transform(corpus)
     sum_words = bag_of_words.sum(axis=0)
     words_freq = [(word, sum_words[0, idx]) for word, idx in vec.vocabulary_.items()]
@@ -49,57 +199,118 @@ def get_top_ngrams(corpus, n=2, top_k=20):
 st.title("📈 Dashboard Analisis Sentimen Isu Publik")
 st.markdown("Analisis sentimen *real-time* dari komentar netizen di YouTube.")
 
-df_raw = load_data_from_mongo()
+legacy_dates = False
+if DASHBOARD_MODE in ("auto", "full"):
+    try:
+        legacy_dates = has_legacy_dates()
+    except Exception:
+        pass  # Error koneksi ditampilkan oleh loader data
+if DASHBOARD_MODE == "auto":
+    DASHBOARD_MODE = "full" if legacy_dates else "aggregate"
+    if legacy_dates:
+        st.sidebar.info("Sebagian komentar masih menyimpan tanggal sebagai teks, jadi dashboard memakai mode full. "
+                        "Jalankan `python migrate_published_at.py` untuk beralih ke mode agregasi.")
 
-if not df_raw.empty:
+if DASHBOARD_MODE == "full":
+    try:
+        df_raw = load_data_from_mongo()
+    except Exception as e:
+        # Hanya muncul saat belum ada data di cache; refresh latar yang gagal tetap memakai data lama
+        st.error(f"Gagal terhubung ke MongoDB: {e}")
+        df_raw = pd.DataFrame()
+    has_data = not df_raw.empty
+    if has_data:
+        min_date = df_raw['published_at'].min().date()
+        max_date = df_raw['published_at'].max().date()
+        st.sidebar.caption(f"Memori data: {dashboard_data.memory_footprint(df_raw) / 2**20:,.1f} MB ({len(df_raw):,} komentar)")
+else:
+    try:
+        min_date, max_date, sentiment_values = load_filter_options()
+    except Exception as e:
+        st.error(f"Gagal terhubung ke MongoDB: {e}")
+        min_date, max_date, sentiment_values = None, None, []
+    has_data = min_date is not None
+
+if has_data:
     # --- SIDEBAR & FILTER GLOBAL ---
     st.sidebar.header("⚙️ Filter Data")
-    
+
     # Filter tanggal
-    min_date = df_raw['published_at'].min().date()
-    max_date = df_raw['published_at'].max().date()
-    
     date_range = st.sidebar.date_input(
         "Pilih Rentang Tanggal:",
         (min_date, max_date),
         min_value=min_date,
         max_value=max_date
     )
-    
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        # Filter dataframe berdasarkan rentang tanggal yang dipilih
-        mask = (df_raw['published_at'].dt.date >= start_date) & (df_raw['published_at'].dt.date <= end_date)
-        df = df_raw.loc[mask]
-    else:
-        df = df_raw.copy()
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+
+    if DASHBOARD_MODE == "full":
+        if start_date:
+            # Filter dataframe berdasarkan rentang tanggal yang dipilih
+            mask = (df_raw['published_at'].dt.date >= start_date) & (df_raw['published_at'].dt.date <= end_date)
+            df = df_raw.loc[mask]
+        else:
+            df = df_raw.copy()
+        sentiment_values = df['sentiment'].unique().tolist()
 
     # Filter sentimen
-    sentiment_options = ['Semua'] + df['sentiment'].unique().tolist()
+    sentiment_options = ['Semua'] + sentiment_values
     selected_sentiment = st.sidebar.selectbox("Pilih Sentimen:", sentiment_options)
-    
-    if selected_sentiment != 'Semua':
-        df = df[df['sentiment'] == selected_sentiment]
 
     if st.sidebar.button("🔄 Refresh Data"):
         st.cache_data.clear()
+        clear_stale_caches()
         st.rerun()
 
+    if DASHBOARD_MODE == "full":
+        if selected_sentiment != 'Semua':
+            df = df[df['sentiment'] == selected_sentiment]
+        # Kategori yang tidak muncul setelah filter tidak ikut ditampilkan
+        sentiment_counts = df['sentiment'].value_counts().loc[lambda counts: counts > 0]
+        df['tanggal'] = df['published_at'].dt.date
+        sentiment_over_time = df.groupby(['tanggal', 'sentiment'], observed=True).size().unstack(fill_value=0)
+        top_liked = with_comment_text(df.nlargest(10, "like_count"))[['author', 'comment', 'like_count', 'sentiment']]
+        raw_view = df[['published_at', 'author', 'comment_id', 'sentiment', 'like_count']]
+    else:
+        # Hanya ringkasan kecil untuk KPI; panel lain dimuat setelah KPI tampil
+        sentiment_counts = load_summary(start_date, end_date, selected_sentiment)
+
     # --- RINGKASAN EKSEKUTIF (KPI) ---
     st.markdown("---")
     st.header("Executive Summary")
-    
-    total_comments = len(df)
-    neg_count = df[df['sentiment'] == 'Negatif'].shape[0]
-    pos_count = df[df['sentiment'] == 'Positif'].shape[0]
-    net_count = df[df['sentiment'] == 'Netral'].shape[0]
+
+    total_comments = int(sentiment_counts.sum())
+    neg_count = int(sentiment_counts.get('Negatif', 0))
+    pos_count = int(sentiment_counts.get('Positif', 0))
+    net_count = int(sentiment_counts.get('Netral', 0))
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total Komentar", f"{total_comments:,}")
     col2.metric("Sentimen Negatif 🔻", f"{neg_count:,}", f"{neg_count/total_comments:.1%}" if total_comments > 0 else "0%")
     col3.metric("Sentimen Positif ▲", f"{pos_count:,}", f"{pos_count/total_comments:.1%}" if total_comments > 0 else "0%")
     col4.metric("Sentimen Netral ➖", f"{net_count:,}", f"{net_count/total_comments:.1%}" if total_comments > 0 else "0%")
-    
+
+    if DASHBOARD_MODE != "full":
+        aggregates = load_aggregates(start_date, end_date, selected_sentiment)
+        sentiment_over_time = aggregates["sentiment_over_time"]
+        top_liked = aggregates["top_liked"]
+        raw_view = None  # Dimuat per halaman dari MongoDB
+
+    # Panel topik & word cloud (kedua mode) dari indeks kata harian; teks komentar
+    # negatif hanya dibaca jika indeks belum tersedia, di-cache per filter. Komentar
+    # dengan published_at string belum masuk indeks kata, jadi selama data belum
+    # dimigrasi mode full menghitung panel dari teksnya
+    if DASHBOARD_MODE == "full" and legacy_dates:
+        term_panels = None
+    else:
+        term_panels = load_term_panels(start_date, end_date, selected_sentiment)
+    if term_panels is not None:
+        top_topics, word_frequencies = term_panels
+        neg_comments = pd.Series(dtype="object")
+    else:
+        top_topics, word_frequencies = [], {}
+        neg_comments = load_negative_comments(start_date, end_date, selected_sentiment, legacy_dates)
+
     # --- ANALISIS SENTIMEN MENDALAM ---
     st.markdown("---")
     st.header("📊 Analisis Sentimen Mendalam")
@@ -107,7 +318,7 @@ if not df_raw.empty:
     col5, col6 = st.columns([1, 2])
     with col5:
         st.subheader("Distribusi Sentimen")
-        sentiment_counts = df['sentiment'].value_counts()
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots()
         ax.pie(sentiment_counts, labels=sentiment_counts.index, autopct='%1.1f%%', startangle=90, colors=['#d9534f','#5cb85c','#f0ad4e'])
         ax.axis('equal') # Pastikan pie chart berbentuk lingkaran
@@ -115,42 +326,68 @@ if not df_raw.empty:
 
     with col6:
         st.subheader("Tren Sentimen Harian")
-        df['tanggal'] = df['published_at'].dt.date
-        sentiment_over_time = df.groupby(['tanggal', 'sentiment']).size().unstack(fill_value=0)
-        st.line_chart(sentiment_over_time, color=['#d9534f','#f0ad4e','#5cb85c']) # Sesuaikan warna
+        st.line_chart(sentiment_over_time, color=['#d9534f','#f0ad4e','#5cb85c'][:len(sentiment_over_time.columns)]) # Sesuaikan warna
 
     # --- ANALISIS TOPIK & KUALITATIF ---
     st.markdown("---")
     st.header("💬 Analisis Topik & Kualitatif")
-    
-    neg_comments = df[df['sentiment'] == 'Negatif']['comment'].dropna()
-    
+
     col7, col8 = st.columns(2)
     with col7:
         st.subheader("Topik Utama Komentar Negatif")
         if not neg_comments.empty:
             top_topics = get_top_ngrams(neg_comments, n=2, top_k=15)
+        if top_topics:
             topics_df = pd.DataFrame(top_topics, columns=['Topik', 'Jumlah']).set_index('Topik')
             st.bar_chart(topics_df)
     with col8:
         st.subheader("Word Cloud Komentar Negatif")
-        if not neg_comments.empty:
-            text = " ".join(comment for comment in neg_comments)
-            wordcloud = WordCloud(width=800, height=400, background_color="white", collocations=False).generate(text)
-            st.image(wordcloud.to_array())
+        if word_frequencies:
+            st.image(make_wordcloud(frequencies=word_frequencies))
+        elif not neg_comments.empty:
+            st.image(make_wordcloud(text=" ".join(comment for comment in neg_comments)))
 
     # --- KOMENTAR PALING POPULER ---
     st.markdown("---")
     st.header("⭐ Komentar Paling Populer (Berdasarkan Likes)")
-    
-    st.dataframe(
-        df.sort_values("like_count", ascending=False).head(10)[['author', 'comment', 'like_count', 'sentiment']],
-        use_container_width=True
-    )
-    
+
+    st.dataframe(top_liked, use_container_width=True)
+
     # --- DATA LENGKAP ---
     with st.expander("Lihat Data Lengkap (Filtered)"):
-        st.dataframe(df[['published_at', 'author', 'comment', 'sentiment', 'like_count']], use_container_width=True)
+        if raw_view is None:
+            # Paginasi & pengurutan di sisi MongoDB: hanya halaman yang terlihat yang diambil
+            total_rows = count_filtered_comments(start_date, end_date, selected_sentiment)
+            col_sort, col_size, col_page = st.columns(3)
+            sort_by = col_sort.selectbox("Urutkan:", list(dashboard_data.TABLE_SORTS))
+            page_size = col_size.selectbox("Baris per halaman:", TABLE_PAGE_SIZES, index=1)
+            total_pages = max(1, math.ceil(total_rows / page_size))
+            page = col_page.number_input("Halaman:", min_value=1, max_value=total_pages, value=1, step=1)
+            raw_view = load_comments_page(start_date, end_date, selected_sentiment, sort_by, int(page), page_size)
+            st.dataframe(raw_view, use_container_width=True)
+            st.caption(f"Halaman {int(page):,} dari {total_pages:,} ({total_rows:,} komentar sesuai filter).")
+            if get_history() is not None:
+                st.caption("Tabel dan ekspor berisi komentar di koleksi live; komentar yang lebih lama tersimpan di arsip Parquet.")
+
+            export_format = st.radio("Format ekspor:", ["csv", "parquet"], horizontal=True)
+            if st.button("📦 Siapkan File Ekspor"):
+                with st.spinner("Menulis file ekspor..."), \
+                        export_filtered_comments(start_date, end_date, selected_sentiment, export_format) as (rows, export_file):
+                    st.download_button(
+                        f"⬇️ Unduh {rows:,} komentar ({export_format.upper()})",
+                        data=export_file,
+                        file_name=f"komentar_{start_date}_{end_date}.{export_format}",
+                        mime="text/csv" if export_format == "csv" else "application/octet-stream",
+                    )
+        else:
+            # Mode full: data sudah di memori, tetapi teks komentar hanya dimuat untuk halaman yang terlihat
+            col_size, col_page = st.columns(2)
+            page_size = col_size.selectbox("Baris per halaman:", TABLE_PAGE_SIZES, index=1)
+            total_pages = max(1, math.ceil(len(raw_view) / page_size))
+            page = int(col_page.number_input("Halaman:", min_value=1, max_value=total_pages, value=1, step=1))
+            page_rows = raw_view.iloc[(page - 1) * page_size:page * page_size]
+            st.dataframe(with_comment_text(page_rows)[dashboard_data.TABLE_COLUMNS], use_container_width=True)
+            st.caption(f"Halaman {page:,} dari {total_pages:,} ({len(raw_view):,} komentar sesuai filter).")
 
 else:
     st.warning("Tidak ada data untuk ditampilkan. Jalankan crawler sekali secara manual atau tunggu jadwal otomatis berjalan.")
@@ -168,4 +405,19 @@ if st.sidebar.button("Analisis"):
                 st.sidebar.success(f"Sentimen Prediksi: **{result['sentiment']}**")
             else: st.sidebar.error(f"Error: {response.text}")
         except requests.exceptions.ConnectionError:
-            st.sidebar.error("Gagal terhubung ke backend. Pastikan app.py sudah berjalan.")
\ No newline at end of file
+            st.sidebar.error("Gagal terhubung ke backend. Pastikan app.py sudah berjalan.")
+
+st.sidebar.markdown("---")
+st.sidebar.header("📋 Analisis Banyak Teks")
+bulk_text = st.sidebar.text_area("Masukkan satu teks per baris:")
+if st.sidebar.button("Analisis Semua"):
+    bulk_texts = [line.strip() for line in bulk_text.splitlines() if line.strip()]
+    if bulk_texts:
+        try:
+            response = requests.post(BATCH_API_URL, json={"texts": bulk_texts})
+            if response.status_code == 200:
+                results_df = pd.DataFrame(response.json()['results'])[['text', 'sentiment']]
+                st.sidebar.dataframe(results_df, use_container_width=True)
+            else: st.sidebar.error(f"Error: {response.text}")
+        except requests.exceptions.ConnectionError:
+            st.sidebar.error("Gagal terhubung ke backend. Pastikan app.py sudah berjalan.")
@@ -0,0 +1,324 @@
+# File: dashboard_data.py
+
+"""
+Query agregasi MongoDB untuk dashboard.py.
+
+Semua perhitungan (KPI, distribusi sentimen, tren harian, komentar populer)
+dilakukan di server MongoDB dan hanya hasil ringkasnya yang dikirim ke
+Streamlit, sehingga waktu muat halaman dan memori tidak tumbuh seiring
+jumlah komentar. Hitungan per sentimen dibaca dari rollup per jam
+(`sentiment_hourly`) jika tersedia. Komentar yang sudah kedaluwarsa dari
+koleksi live dibaca dari arsip Parquet (lihat archiver.py).
+"""
+
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+
+# archiver (pyarrow) hanya diimpor di jalur yang membaca arsip
+import rollup
+import term_index
+
+# Urutan tabel data lengkap. Setiap urutan didukung index (lihat setup_indexes.py)
+# dan diakhiri `_id` agar batas halaman stabil untuk nilai yang sama
+TABLE_SORTS = {
+    "Terbaru": [("published_at", -1), ("_id", -1)],
+    "Terlama": [("published_at", 1), ("_id", 1)],
+    "Like terbanyak": [("like_count", -1), ("_id", -1)],
+}
+TABLE_COLUMNS = ["published_at", "author", "comment", "sentiment", "like_count"]
+EXPORT_COLUMNS = TABLE_COLUMNS + ["video_id", "topic", "comment_id"]
+EXPORT_CHUNK_SIZE = 5000
+# Mode "full": field yang dimuat ke pandas. Teks komentar tidak ikut; diambil per
+# comment_id hanya untuk baris yang ditampilkan (lihat get_comment_texts_by_id)
+FRAME_FIELDS = ["comment_id", "published_at", "author", "sentiment", "like_count"]
+# Hanya kolom dengan sedikit nilai unik yang dijadikan kategori; penulis hampir
+# unik per baris sehingga kategori justru menambah memori
+FRAME_CATEGORY_COLUMNS = ["sentiment"]
+FRAME_STRING_COLUMNS = ["comment_id", "author"]
+TEXT_LOOKUP_BATCH_SIZE = 1000
+
+
+def build_match(start_date=None, end_date=None, sentiment=None, include_legacy=False):
+    """
+    Filter `$match` untuk rentang tanggal (inklusif) dan sentimen yang dipilih.
+    Dengan `include_legacy`, dokumen yang published_at-nya masih string ISO (belum
+    dimigrasi) ikut cocok; hanya untuk query yang tidak mengolah published_at
+    sebagai tanggal, misalnya pengambilan teks komentar.
+    """
+    match = {}
+    if start_date and end_date:
+        start, end = _hour_range(start_date, end_date)
+        match["published_at"] = {"$gte": start, "$lt": end}
+        if include_legacy:
+            # String ISO ('2025-09-01T12:00:00Z') urut secara leksikografis
+            match = {"$or": [match, {"published_at": {"$gte": start.isoformat(), "$lt": end.isoformat()}}]}
+    elif include_legacy:
+        match = {"$or": [{"published_at": {"$type": "date"}}, {"published_at": {"$type": "string"}}]}
+    else:
+        # Hanya dokumen dengan published_at bertipe tanggal yang bisa diagregasi per hari
+        match["published_at"] = {"$type": "date"}
+    if sentiment and sentiment != "Semua":
+        match["sentiment"] = sentiment
+    return match
+
+
+def _hour_range(start_date, end_date):
+    if start_date and end_date:
+        return datetime.combine(start_date, time.min), datetime.combine(end_date + timedelta(days=1), time.min)
+    return datetime.min, datetime.max
+
+
+def _pivot_daily(rows):
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df["tanggal"] = pd.to_datetime(df["tanggal"]).dt.date
+    return df.pivot_table(index="tanggal", columns="sentiment", values="count", fill_value=0).astype("int64").sort_index()
+
+
+def get_date_bounds(collection, rollup_collection=None):
+    """
+    Tanggal komentar paling awal dan paling akhir. Rollup dipakai lebih dulu
+    karena menyimpan riwayat lebih panjang dari koleksi komentar (TTL 2 hari).
+    """
+    for coll, field in ((rollup_collection, "hour"), (collection, "published_at")):
+        if coll is None:
+            continue
+        query = {field: {"$type": "date"}}
+        first = coll.find_one(query, {field: 1}, sort=[(field, 1)])
+        last = coll.find_one(query, {field: 1}, sort=[(field, -1)])
+        if first and last:
+            return first[field].date(), last[field].date()
+    return None, None
+
+
+def has_string_dates(collection):
+    """True jika masih ada `published_at` string yang belum dimigrasi (lihat migrate_published_at.py)."""
+    return collection.find_one({"published_at": {"$type": "string"}}, {"_id": 1}) is not None
+
+
+def get_sentiment_options(collection):
+    return sorted(s for s in collection.distinct("sentiment") if s)
+
+
+def get_sentiment_counts(collection, match):
+    """Jumlah komentar per sentimen; dipakai untuk KPI dan pie chart."""
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}},
+    ]
+    counts = {doc["_id"]: doc["count"] for doc in collection.aggregate(pipeline)}
+    return pd.Series(counts, dtype="int64").sort_values(ascending=False)
+
+
+def get_daily_trend(collection, match):
+    """Jumlah komentar per hari per sentimen, dalam bentuk tabel siap `st.line_chart`."""
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "tanggal": {"$dateToString": {"format": "%Y-%m-%d", "date": "$published_at"}},
+                "sentiment": "$sentiment",
+            },
+            "count": {"$sum": 1},
+        }},
+    ]
+    rows = [{"tanggal": doc["_id"]["tanggal"], "sentiment": doc["_id"]["sentiment"], "count": doc["count"]}
+            for doc in collection.aggregate(pipeline)]
+    return _pivot_daily(rows)
+
+
+def get_sentiment_counts_from_rollup(rollup_collection, start_date, end_date, sentiment=None):
+    """Seperti `get_sentiment_counts`, tetapi membaca O(jam) dokumen rollup."""
+    start, end = _hour_range(start_date, end_date)
+    counts = rollup.window_counts(rollup_collection, start, end)
+    if sentiment and sentiment != "Semua":
+        counts = {k: v for k, v in counts.items() if k == sentiment}
+    return pd.Series(counts, dtype="int64").sort_values(ascending=False)
+
+
+def get_daily_trend_from_rollup(rollup_collection, start_date, end_date, sentiment=None):
+    """Seperti `get_daily_trend`, tetapi membaca O(jam) dokumen rollup."""
+    start, end = _hour_range(start_date, end_date)
+    selected = sentiment if sentiment and sentiment != "Semua" else None
+    return _pivot_daily(rollup.daily_counts(rollup_collection, start, end, selected))
+
+
+def get_top_liked(collection, match, limit=10):
+    """Komentar dengan like terbanyak dalam filter yang dipilih."""
+    cursor = collection.find(
+        match,
+        {"_id": 0, "author": 1, "comment": 1, "like_count": 1, "sentiment": 1},
+        sort=TABLE_SORTS["Like terbanyak"],
+        limit=limit,
+    )
+    return pd.DataFrame(list(cursor), columns=["author", "comment", "like_count", "sentiment"])
+
+
+def get_comment_texts(collection, match, sentiment="Negatif"):
+    """Teks komentar untuk panel topik & word cloud (hanya field `comment`)."""
+    if match.get("sentiment", sentiment) != sentiment:
+        return pd.Series(dtype="object")
+    cursor = collection.find(dict(match, sentiment=sentiment), {"_id": 0, "comment": 1})
+    return pd.Series([doc.get("comment") for doc in cursor], dtype="object").dropna()
+
+
+def load_compact_frame(collection):
+    """
+    Seluruh koleksi sebagai DataFrame ringkas: hanya FRAME_FIELDS, sentimen
+    sebagai kategori, like_count dengan tipe integer terkecil yang cukup, dan
+    comment_id serta penulis sebagai string berbasis Arrow.
+    """
+    cursor = collection.find({}, {"_id": 0, **{field: 1 for field in FRAME_FIELDS}})
+    df = pd.DataFrame(list(cursor), columns=FRAME_FIELDS)
+    # Data lama tersimpan sebagai string ISO, data baru sebagai datetime UTC
+    df["published_at"] = pd.to_datetime(df["published_at"], utc=True).dt.tz_localize(None)
+    df["like_count"] = pd.to_numeric(pd.to_numeric(df["like_count"], errors="coerce").fillna(0), downcast="unsigned")
+    for column in FRAME_STRING_COLUMNS:
+        df[column] = df[column].astype("string[pyarrow]")
+    for column in FRAME_CATEGORY_COLUMNS:
+        df[column] = df[column].astype("category")
+    return df
+
+
+def memory_footprint(df):
+    """Ukuran DataFrame dalam byte, termasuk isi string dan kategori."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def get_comment_texts_by_id(collection, comment_ids, batch_size=TEXT_LOOKUP_BATCH_SIZE):
+    """Teks komentar untuk `comment_ids`, sesuai urutannya (None jika tidak ditemukan)."""
+    comment_ids = list(comment_ids)
+    texts = {}
+    for i in range(0, len(comment_ids), batch_size):
+        query = {"comment_id": {"$in": comment_ids[i:i + batch_size]}}
+        for doc in collection.find(query, {"_id": 0, "comment_id": 1, "comment": 1}):
+            texts[doc["comment_id"]] = doc.get("comment")
+    return pd.Series([texts.get(comment_id) for comment_id in comment_ids], dtype="object")
+
+
+def split_history_range(history, start_date, end_date, live_start=None):
+    """
+    Bagi rentang filter menjadi bagian arsip (tanggal sebelum `live_start`) dan
+    bagian live. Mengembalikan ((awal, akhir) arsip atau None, awal live atau
+    None, akhir live). Tanpa arsip, seluruh rentang dibaca dari koleksi live.
+    """
+    if history is None:
+        return None, start_date, end_date
+    import archiver
+    live_start = live_start or archiver.live_start_date()
+    start = start_date or date.min
+    end = end_date or date.max - timedelta(days=1)  # _hour_range menambah satu hari
+    history_range = (start, min(end, live_start - timedelta(days=1))) if start < live_start else None
+    if end < live_start:
+        return history_range, None, None
+    return history_range, max(start, live_start), end
+
+
+def get_top_liked_with_history(collection, history, start_date, end_date, sentiment, limit=10):
+    """`get_top_liked` untuk rentang yang sebagian sudah berpindah ke arsip Parquet."""
+    history_range, live_start, live_end = split_history_range(history, start_date, end_date)
+    if history_range is None:
+        return get_top_liked(collection, build_match(start_date, end_date, sentiment), limit)
+    import archiver
+    columns = ["author", "comment", "like_count", "sentiment"]
+    frames = [archiver.read_history(history, *history_range, columns, sentiment).nlargest(limit, "like_count")]
+    if live_start:
+        frames.append(get_top_liked(collection, build_match(live_start, live_end, sentiment), limit))
+    combined = pd.concat(frames, ignore_index=True)
+    combined["sentiment"] = combined["sentiment"].astype("object")
+    return combined.nlargest(limit, "like_count")[columns].reset_index(drop=True)
+
+
+def get_comment_texts_with_history(collection, history, start_date, end_date, sentiment, target="Negatif", include_legacy=False):
+    """`get_comment_texts` untuk rentang yang sebagian sudah berpindah ke arsip Parquet."""
+    history_range, live_start, live_end = split_history_range(history, start_date, end_date)
+    if history_range is None:
+        return get_comment_texts(collection, build_match(start_date, end_date, sentiment, include_legacy), target)
+    if sentiment not in (None, "Semua", target):
+        return pd.Series(dtype="object")
+    import archiver
+    texts = [archiver.read_history(history, *history_range, ["comment"], target)["comment"].dropna()]
+    if include_legacy:
+        # published_at string tidak pernah dihapus TTL, jadi tanggal lamanya masih ada di koleksi live
+        start, end = _hour_range(*history_range)
+        legacy_match = {"published_at": {"$gte": start.isoformat(), "$lt": end.isoformat()}}
+        texts.append(get_comment_texts(collection, legacy_match, target))
+    if live_start:
+        texts.append(get_comment_texts(collection, build_match(live_start, live_end, sentiment, include_legacy), target))
+    return pd.concat(texts, ignore_index=True).astype("object")
+
+
+def count_comments(collection, match):
+    return collection.count_documents(match)
+
+
+def get_comments_page(collection, match, sort_by="Terbaru", page=1, page_size=50):
+    """Satu halaman tabel data lengkap; hanya baris yang terlihat yang diambil dari MongoDB."""
+    cursor = collection.find(
+        match,
+        {"_id": 0, **{column: 1 for column in TABLE_COLUMNS}},
+        sort=TABLE_SORTS[sort_by],
+        skip=(max(page, 1) - 1) * page_size,
+        limit=page_size,
+    )
+    return pd.DataFrame(list(cursor), columns=TABLE_COLUMNS)
+
+
+def iter_comment_chunks(collection, match, chunk_size=EXPORT_CHUNK_SIZE):
+    """Alirkan komentar sesuai filter sebagai DataFrame berukuran `chunk_size` baris."""
+    cursor = collection.find(match, {"_id": 0, **{column: 1 for column in EXPORT_COLUMNS}}, batch_size=chunk_size)
+    chunk = []
+    for doc in cursor:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield _normalize_export_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield _normalize_export_chunk(chunk)
+
+
+def _normalize_export_chunk(docs):
+    df = pd.DataFrame(docs, columns=EXPORT_COLUMNS)
+    # Data lama tersimpan sebagai string ISO, data baru sebagai datetime UTC
+    df["published_at"] = pd.to_datetime(df["published_at"], utc=True, errors="coerce").dt.tz_localize(None)
+    df["like_count"] = pd.to_numeric(df["like_count"], errors="coerce").fillna(0).astype("int64")
+    return df
+
+
+def export_comments(collection, match, path, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Tulis komentar sesuai filter ke file CSV atau Parquet per chunk, sehingga
+    memori yang dipakai sebanding dengan `chunk_size`, bukan jumlah komentar.
+    Mengembalikan jumlah baris yang ditulis.
+    """
+    rows = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("published_at", pa.timestamp("ms")), ("author", pa.string()), ("comment", pa.string()),
+            ("sentiment", pa.string()), ("like_count", pa.int64()), ("video_id", pa.string()),
+            ("topic", pa.string()), ("comment_id", pa.string()),
+        ])
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for chunk in iter_comment_chunks(collection, match, chunk_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        return rows
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for chunk in iter_comment_chunks(collection, match, chunk_size):
+            chunk.to_csv(f, header=(rows == 0), index=False)
+            rows += len(chunk)
+        if rows == 0:
+            f.write(",".join(EXPORT_COLUMNS) + "\n")
+    return rows
+
+
+def get_top_terms(term_collection, start_date, end_date, sentiment, n, top_k):
+    """Term terbanyak dari indeks kata harian untuk rentang tanggal yang dipilih."""
+    start, end = _hour_range(start_date, end_date)
+    return term_index.top_terms(term_collection, start, end, sentiment, n, top_k)
@@ -0,0 +1,163 @@
+# File: export_model.py
+
+import os
+import sys
+import json
+import inspect
+import argparse
+import torch
+from dotenv import load_dotenv
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from inference import BACKENDS, MAX_LENGTH, MODEL_PATH, ONNX_FILENAME, load_sentiment_model, onnx_dir_for
+
+# --- KONFIGURASI ---
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
+DB_NAME = "db_sentimen"
+COLLECTION_NAME = "netizen_comments"
+PARITY_SAMPLE_SIZE = 500
+MIN_AGREEMENT = 0.98  # Minimal kecocokan label dengan model fp32
+
+# Dipakai jika tidak ada file sampel maupun koneksi MongoDB
+FALLBACK_SAMPLE = [
+    "bubarkan dpr sekarang juga",
+    "semoga demo hari ini berjalan damai dan aman",
+    "tunjangan dpr terlalu besar, rakyat makin susah",
+    "terima kasih polisi sudah menjaga keamanan",
+    "ruu perampasan aset harus segera disahkan!!!",
+    "videonya kurang jelas suaranya",
+    "mantap pak, lanjutkan perjuangan",
+    "kapan ya rapatnya dimulai?",
+]
+
+
+def export_onnx(model_path, output_dir):
+    """Ekspor model ke ONNX (opset 14, sumbu batch & sequence dinamis)."""
+    print(f"📦 Mengekspor {model_path} ke ONNX...")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+
+    os.makedirs(output_dir, exist_ok=True)
+    dummy = tokenizer(["contoh komentar untuk ekspor"], return_tensors="pt", padding=True, truncation=True, max_length=MAX_LENGTH)
+    # Input graf mengikuti urutan parameter forward() (input_ids, attention_mask,
+    # token_type_ids), bukan urutan kunci tokenizer; nama harus diberikan dengan urutan yang sama
+    forward_params = list(inspect.signature(model.forward).parameters)
+    input_names = sorted(dummy.keys(), key=forward_params.index)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    onnx_path = os.path.join(output_dir, ONNX_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            # Dict di akhir args diteruskan sebagai argumen keyword ke forward()
+            ({name: dummy[name] for name in input_names},),
+            onnx_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    print(f"✅ Model ONNX disimpan di {onnx_path} ({os.path.getsize(onnx_path) / 1e6:.1f} MB)")
+
+
+def load_parity_sample(sample_file, limit):
+    """Ambil sampel teks untuk cek paritas: dari file, MongoDB, atau sampel bawaan."""
+    if sample_file:
+        with open(sample_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        print(f"   Sampel paritas: {min(len(texts), limit)} teks dari {sample_file}")
+        return texts[:limit]
+
+    if MONGO_URI:
+        import pymongo
+        client = None
+        try:
+            client = pymongo.MongoClient(MONGO_URI)
+            collection = client[DB_NAME][COLLECTION_NAME]
+            docs = collection.aggregate([
+                {"$match": {"comment": {"$type": "string"}}},
+                {"$sample": {"size": limit}},
+                {"$project": {"_id": 0, "comment": 1}},
+            ])
+            texts = [doc["comment"] for doc in docs]
+            if texts:
+                print(f"   Sampel paritas: {len(texts)} komentar acak dari MongoDB")
+                return texts
+        except Exception as e:
+            print(f"   [Peringatan] Gagal mengambil sampel dari MongoDB: {e}")
+        finally:
+            if client:
+                client.close()
+
+    print(f"   Sampel paritas: {len(FALLBACK_SAMPLE)} teks bawaan")
+    return FALLBACK_SAMPLE
+
+
+def check_parity(model_path, backends, texts, min_agreement):
+    """Bandingkan prediksi tiap backend dengan model fp32 sebagai acuan."""
+    print("🔬 Mengecek paritas akurasi terhadap model fp32...")
+    reference = load_sentiment_model(model_path, "fp32").predict_bucketed(texts, max_length=MAX_LENGTH)
+
+    report = {}
+    passed = True
+    for backend in backends:
+        if backend == "fp32":
+            continue
+        try:
+            candidate = load_sentiment_model(model_path, backend)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"   [Peringatan] Backend {backend} dilewati: {e}")
+            continue
+        results = candidate.predict_bucketed(texts, max_length=MAX_LENGTH)
+        agree = sum(r["sentiment"] == ref["sentiment"] for r, ref in zip(results, reference))
+        diffs = [
+            abs(r["probabilities"][label] - ref["probabilities"][label])
+            for r, ref in zip(results, reference)
+            for label in ref["probabilities"]
+        ]
+        agreement = agree / len(texts) if texts else 1.0
+        report[backend] = {
+            "label_agreement": round(agreement, 4),
+            "max_prob_diff": round(max(diffs, default=0.0), 4),
+            "mean_prob_diff": round(sum(diffs) / len(diffs), 4) if diffs else 0.0,
+            "samples": len(texts),
+        }
+        status = "✅" if agreement >= min_agreement else "❌"
+        passed = passed and agreement >= min_agreement
+        print(f"   {status} {backend}: kecocokan label {agreement:.2%}, selisih probabilitas maks {report[backend]['max_prob_diff']}")
+    return report, passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekspor model ke ONNX dan cek paritas akurasi tiap backend inferensi.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Path lokal atau ID Hugging Face model")
+    parser.add_argument("--check-only", action="store_true", help="Lewati ekspor, hanya cek paritas")
+    parser.add_argument("--skip-check", action="store_true", help="Lewati cek paritas setelah ekspor")
+    parser.add_argument("--sample-file", help="File teks (satu komentar per baris) untuk cek paritas")
+    parser.add_argument("--limit", type=int, default=PARITY_SAMPLE_SIZE, help="Jumlah sampel untuk cek paritas")
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    output_dir = onnx_dir_for(args.model)
+    if not args.check_only:
+        export_onnx(args.model, output_dir)
+
+    if args.skip_check:
+        return
+
+    texts = load_parity_sample(args.sample_file, args.limit)
+    report, passed = check_parity(args.model, BACKENDS, texts, args.min_agreement)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "parity_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    if not passed:
+        print(f"❌ Paritas di bawah batas minimal {args.min_agreement:.0%}. Jangan gunakan backend tersebut.")
+        sys.exit(1)
+    print("🏁 Semua backend lolos cek paritas.")
+
+
+if __name__ == "__main__":
+    main()
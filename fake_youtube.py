@@ -0,0 +1,174 @@
+# File: fake_youtube.py
+
+"""
+Pengganti lokal YouTube Data API v3 untuk mencoba crawler tanpa kuota/API key.
+
+Hanya meniru bagian yang dipakai crawler: `search().list`,
+`commentThreads().list` dan `commentThreads().list_next`, lengkap dengan
+paging, latensi jaringan buatan, dan error sementara (HTTP 503) acak.
+
+Contoh menjalankan fetcher paralel terhadap stand-in ini:
+    python fake_youtube.py --videos 20 --comments 1500 --target 10000 --workers 8
+"""
+
+import time
+import random
+import argparse
+import threading
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+from googleapiclient.errors import HttpError
+
+SAMPLE_COMMENTS = [
+    "bubarkan dpr", "😡😡😡", "semoga demo berjalan damai", "tunjangan dpr tidak masuk akal",
+    "sahkan ruu perampasan aset sekarang", "mantap pak", "rakyat makin susah", "hadir",
+]
+
+
+class FakeRequest:
+    def __init__(self, api, execute_fn, params):
+        self._api = api
+        self._execute_fn = execute_fn
+        self.params = params
+
+    def execute(self):
+        self._api.record_call()
+        time.sleep(self._api.latency)
+        if self._api.rng.random() < self._api.error_rate:
+            resp = SimpleNamespace(status=503, reason="Service Unavailable")
+            raise HttpError(resp, b'{"error": {"message": "backendError"}}')
+        return self._execute_fn(self.params)
+
+
+class FakeCommentThreads:
+    def __init__(self, api):
+        self._api = api
+
+    def list(self, videoId, maxResults=20, pageToken=None, **kwargs):
+        params = dict(kwargs, videoId=videoId, maxResults=maxResults, pageToken=pageToken)
+        return FakeRequest(self._api, self._api.comment_page, params)
+
+    def list_next(self, previous_request, previous_response):
+        token = previous_response.get('nextPageToken')
+        if not token:
+            return None
+        params = dict(previous_request.params, pageToken=token)
+        return FakeRequest(self._api, self._api.comment_page, params)
+
+
+class FakeSearch:
+    def __init__(self, api):
+        self._api = api
+
+    def list(self, maxResults=5, **kwargs):
+        def execute(params):
+            ids = list(self._api.videos)[:params['maxResults']]
+            return {'items': [{'id': {'videoId': vid}} for vid in ids]}
+        return FakeRequest(self._api, execute, dict(kwargs, maxResults=maxResults))
+
+
+class FakeYouTube:
+    """
+    `videos` adalah dict video_id -> jumlah komentar. Satu instance boleh
+    dibagikan ke banyak thread; `calls` mencatat total request yang masuk.
+    """
+
+    def __init__(self, videos, latency=0.05, error_rate=0.0, seed=0):
+        self.videos = videos
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._start = datetime.utcnow().replace(microsecond=0) - timedelta(days=7)
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def post_comments(self, video_id, count):
+        """Tambahkan `count` komentar baru (paling baru) ke sebuah video."""
+        with self._lock:
+            self.videos[video_id] = self.videos.get(video_id, 0) + count
+
+    def commentThreads(self):
+        return FakeCommentThreads(self)
+
+    def search(self):
+        return FakeSearch(self)
+
+    def comment_page(self, params):
+        video_id = params['videoId']
+        total = self.videos.get(video_id, 0)
+        start = int(params.get('pageToken') or 0)
+        end = min(total, start + params['maxResults'])
+        items = []
+        for position in range(start, end):
+            i = total - 1 - position  # urutan terbaru lebih dulu; komentar ke-i dikirim i menit setelah _start
+            published = self._start + timedelta(minutes=i)
+            items.append({
+                'id': f"{video_id}-c{i}",
+                'snippet': {'topLevelComment': {'snippet': {
+                    'authorDisplayName': f"user{i % 97}",
+                    'textDisplay': SAMPLE_COMMENTS[i % len(SAMPLE_COMMENTS)],
+                    'publishedAt': published.isoformat() + "Z",
+                    'likeCount': i % 13,
+                }}},
+            })
+        response = {'items': items}
+        if end < total:
+            response['nextPageToken'] = str(end)
+        return response
+
+
+def main():
+    from youtube_fetcher import CommentFetcher, CrawlState, QuotaTracker, RateLimiter
+
+    parser = argparse.ArgumentParser(description="Jalankan CommentFetcher terhadap YouTube API palsu.")
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--comments", type=int, default=1500, help="Jumlah komentar per video")
+    parser.add_argument("--target", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=50)
+    parser.add_argument("--quota", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--new-comments", type=int, default=20, help="Komentar baru per video sebelum run kedua (inkremental)")
+    args = parser.parse_args()
+
+    api = FakeYouTube({f"vid{i:03d}": args.comments for i in range(args.videos)}, latency=args.latency, error_rate=args.error_rate)
+    state = CrawlState()
+    fetcher = CommentFetcher(lambda: api, args.target, workers=args.workers, limiter=RateLimiter(args.rps), quota=QuotaTracker(args.quota), state=state)
+
+    started = time.perf_counter()
+    comments = fetcher.fetch_all(list(api.videos))
+    elapsed = time.perf_counter() - started
+
+    unique_ids = {c['comment_id'] for c in comments}
+    print(f"✅ {len(comments)} komentar ({len(unique_ids)} unik) dari {fetcher.pages} halaman dalam {elapsed:.2f} detik")
+    print(f"   Request API: {api.calls}, kuota terpakai: {fetcher.quota.used}, video gagal: {len(fetcher.failed_videos)}")
+    assert len(comments) <= args.target, "Target komentar terlampaui"
+    assert len(unique_ids) == len(comments), "Ada komentar duplikat"
+
+    # Run kedua memakai watermark run pertama: hanya komentar baru (dan sisa celah
+    # jika run pertama terhenti karena target) yang diambil
+    for video_id in api.videos:
+        api.post_comments(video_id, args.new_comments)
+    calls_before = api.calls
+    second = CommentFetcher(lambda: api, args.target, workers=args.workers, limiter=RateLimiter(args.rps), quota=QuotaTracker(args.quota), state=state)
+    started = time.perf_counter()
+    new_comments = second.fetch_all(list(api.videos))
+    elapsed = time.perf_counter() - started
+    new_ids = {c['comment_id'] for c in new_comments}
+    print(f"🔁 Run kedua: {len(new_comments)} komentar dari {second.pages} halaman dalam {elapsed:.2f} detik, "
+          f"request API: {api.calls - calls_before}, video sudah mutakhir: {second.caught_up_videos}/{len(api.videos)}")
+    assert len(new_ids) == len(new_comments), "Ada komentar duplikat di run kedua"
+    if len(comments) < args.target and not fetcher.failed_videos:
+        # Komentar tepat di watermark ikut terambil ulang (dibuang oleh dedup), paling banyak satu per video
+        assert len(new_ids & unique_ids) <= len(api.videos), "Run kedua mengambil ulang komentar lama"
+        assert len(new_ids - unique_ids) == args.new_comments * len(api.videos), "Komentar baru terlewat"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# File: gunicorn.conf.py
+
+"""
+Konfigurasi gunicorn untuk menjalankan app.py di produksi:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Model dimuat sekali di proses master (preload_app) lalu dibagi ke semua worker
+secara copy-on-write saat fork. Tiap worker mendapat jatah thread inferensi
+sendiri agar total thread tidak melebihi jumlah core, dan baru dianggap siap
+(GET /healthz -> 200) setelah inferensi pemanasan selesai.
+"""
+
+import gc
+import os
+import multiprocessing
+
+# Tokenizer Rust tidak boleh memakai thread pool yang dibuat sebelum fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Worker berbasis thread: request /analyze yang bersamaan dalam satu worker
+# digabung oleh micro-batcher menjadi satu forward pass
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+accesslog = "-"
+
+# Thread intra-op per worker; default membagi core secara merata ke semua worker
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0")) or max(1, multiprocessing.cpu_count() // workers)
+
+
+def when_ready(server):
+    # Dipanggil setelah app dimuat dan sebelum worker pertama di-fork: pindahkan
+    # objek yang sudah ada ke generasi permanen GC agar halaman memorinya tidak
+    # tersalin ulang di setiap worker
+    gc.freeze()
+    server.log.info("Model dimuat; %d worker x %d thread inferensi", workers, INFERENCE_THREADS)
+
+
+def post_fork(server, worker):
+    import app
+
+    app.init_worker(INFERENCE_THREADS)
+    server.log.info("Worker %s: %d thread inferensi, pemanasan dimulai", worker.pid, INFERENCE_THREADS)
@@ -0,0 +1,243 @@
+# File: inference.py
+
+import os
+import hashlib
+import threading
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+
+from metrics import FORWARD_PROFILER, METRICS
+
+# --- KONFIGURASI ---
+# Backend inferensi yang dipakai app.py dan crawler.py:
+#   fp32 -> PyTorch float32 (default, perilaku lama)
+#   int8 -> PyTorch dynamic quantization (bobot nn.Linear int8)
+#   onnx -> ONNX Runtime dari hasil `python export_model.py`
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "fp32")
+# Model yang dipakai bersama oleh app.py dan crawler.py; label diambil dari id2label di config.json
+MODEL_PATH = os.getenv("MODEL_PATH", "./model_terbaik")
+BACKENDS = ("fp32", "int8", "onnx")
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", "./model_onnx")
+ONNX_FILENAME = "model.onnx"
+DEFAULT_MAX_LENGTH = 128
+DEFAULT_CHUNK_SIZE = 64
+# Batas token per komentar, sama untuk app.py dan crawler.py (juga bagian dari namespace cache prediksi)
+MAX_LENGTH = int(os.getenv("MAX_LENGTH", str(DEFAULT_MAX_LENGTH)))
+# Jumlah thread intra-op per proses (0 = bawaan library). Di gunicorn diatur per
+# worker oleh hook post_fork agar total thread tidak melebihi jumlah core.
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+
+_num_threads = INFERENCE_THREADS
+
+
+def set_num_threads(n):
+    """Atur jumlah thread intra-op PyTorch dan ONNX Runtime untuk proses ini."""
+    global _num_threads
+    _num_threads = n
+    if n > 0:
+        torch.set_num_threads(n)
+
+
+def onnx_dir_for(model_path):
+    """Folder hasil ekspor ONNX untuk sebuah model (path lokal atau ID Hugging Face)."""
+    name = model_path.strip("./").replace("/", "__") or "model"
+    return os.path.join(ONNX_EXPORT_DIR, name)
+
+
+def _padded_tokens(lengths, order, chunk_size):
+    """Jumlah token setelah setiap chunk `order` di-padding ke teks terpanjangnya."""
+    total = 0
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start:start + chunk_size]
+        total += max(lengths[i] for i in chunk) * len(chunk)
+    return total
+
+
+class PaddingStats:
+    """
+    Akumulasi token asli vs token setelah padding di `predict_bucketed`, beserta
+    perkiraan jika teks diproses sesuai urutan datang (tanpa pengurutan panjang).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.unsorted_padded_tokens = 0
+
+    def record(self, lengths, order, chunk_size):
+        padded = _padded_tokens(lengths, order, chunk_size)
+        unsorted_padded = _padded_tokens(lengths, range(len(lengths)), chunk_size)
+        with self._lock:
+            self.texts += len(lengths)
+            self.tokens += sum(lengths)
+            self.padded_tokens += padded
+            self.unsorted_padded_tokens += unsorted_padded
+
+    def snapshot(self):
+        with self._lock:
+            def ratio(padded):
+                return 1 - self.tokens / padded if padded else 0.0
+            return {
+                "texts": self.texts,
+                "tokens": self.tokens,
+                "padding_ratio": ratio(self.padded_tokens),
+                "unsorted_padding_ratio": ratio(self.unsorted_padded_tokens),
+            }
+
+
+class SentimentModel:
+    """Pembungkus tokenizer + backend model dengan antarmuka prediksi yang sama."""
+
+    def __init__(self, model_path, backend, tokenizer, config, forward_fn, weights_hash=None):
+        self.model_path = model_path
+        self.backend = backend
+        self.tokenizer = tokenizer
+        self.labels = [config.id2label[i] for i in range(config.num_labels)]
+        # Versi model dipakai sebagai namespace cache prediksi (tier Mongo tanpa TTL),
+        # jadi bobot yang dilatih ulang dengan config.json sama tetap mendapat versi
+        # baru lewat hash isi file bobot. MODEL_VERSION menimpa versi ini jika diisi.
+        config_hash = hashlib.sha1(config.to_json_string().encode("utf-8")).hexdigest()[:12]
+        version = f"{model_path.strip('./')}:{backend}:{config_hash}"
+        if weights_hash:
+            version = f"{version}:{weights_hash}"
+        self.version = os.getenv("MODEL_VERSION") or version
+        # Normalisasi huruf kecil aman untuk cache hanya jika tokenizer juga melakukannya
+        self.lowercase = bool(getattr(tokenizer, "do_lower_case", False))
+        self._forward = forward_fn
+        self.padding = PaddingStats()
+
+    def _run(self, inputs):
+        with METRICS.timer("stage", stage="forward"), FORWARD_PROFILER.profile():
+            logits = self._forward(inputs)
+        METRICS.inc("texts", len(logits), stage="forward")
+        probabilities = torch.softmax(logits, dim=1)
+        results = []
+        for probs in probabilities.tolist():
+            predicted_class_id = max(range(len(probs)), key=probs.__getitem__)
+            results.append({
+                "sentiment": self.labels[predicted_class_id],
+                "probabilities": {label: round(p, 4) for label, p in zip(self.labels, probs)},
+            })
+        return results
+
+    def predict(self, texts, max_length=DEFAULT_MAX_LENGTH):
+        """Jalankan satu forward pass untuk sekumpulan teks sekaligus."""
+        with METRICS.timer("stage", stage="tokenize"):
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=max_length)
+        return self._run(inputs)
+
+    def predict_bucketed(self, texts, max_length=DEFAULT_MAX_LENGTH, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Prediksi banyak teks dengan padding per kelompok panjang token.
+
+        Teks diurutkan berdasarkan panjang token lalu diproses per chunk, sehingga
+        komentar pendek tidak ikut di-padding sepanjang komentar terpanjang.
+        Hasil dikembalikan dalam urutan input semula.
+        """
+        with METRICS.timer("stage", stage="tokenize"):
+            encodings = self.tokenizer(texts, truncation=True, max_length=max_length)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        self.padding.record(lengths, order, chunk_size)
+
+        results = [None] * len(texts)
+        for start in range(0, len(order), chunk_size):
+            chunk_ids = order[start:start + chunk_size]
+            features = [{key: encodings[key][i] for key in encodings.keys()} for i in chunk_ids]
+            with METRICS.timer("stage", stage="tokenize"):
+                inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+            for i, result in zip(chunk_ids, self._run(inputs)):
+                results[i] = result
+        return results
+
+
+def _load_torch_forward(model_path, quantize):
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def forward(inputs):
+        with torch.no_grad():
+            return model(**inputs).logits
+
+    return model.config, forward
+
+
+def _load_onnx_forward(model_path):
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("Backend 'onnx' membutuhkan paket onnxruntime (pip install onnxruntime)")
+
+    onnx_path = os.path.join(onnx_dir_for(model_path), ONNX_FILENAME)
+    if not os.path.exists(onnx_path):
+        raise FileNotFoundError(f"{onnx_path} tidak ditemukan. Jalankan dulu: python export_model.py --model {model_path}")
+
+    # Thread pool ONNX Runtime tidak ikut ter-fork, jadi session dibuat per proses
+    # (mis. sekali di master gunicorn lalu sekali lagi di tiap worker)
+    sessions = {}
+    lock = threading.Lock()
+
+    def get_session():
+        pid = os.getpid()
+        session = sessions.get(pid)
+        if session is None:
+            with lock:
+                session = sessions.get(pid)
+                if session is None:
+                    options = ort.SessionOptions()
+                    if _num_threads > 0:
+                        options.intra_op_num_threads = _num_threads
+                    session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+                    sessions.clear()
+                    sessions[pid] = session
+        return session
+
+    input_names = {i.name for i in get_session().get_inputs()}
+
+    def forward(inputs):
+        feed = {name: tensor.numpy() for name, tensor in inputs.items() if name in input_names}
+        logits = get_session().run(None, feed)[0]
+        return torch.from_numpy(logits)
+
+    return AutoConfig.from_pretrained(model_path), forward
+
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".onnx", ".onnx_data", ".data")
+
+
+def weights_fingerprint(*directories):
+    """Hash isi semua file bobot di `directories` (urut nama), atau None jika tidak ada."""
+    digest = hashlib.sha1()
+    found = False
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(WEIGHT_SUFFIXES):
+                continue
+            found = True
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(directory, name), "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:12] if found else None
+
+
+def load_sentiment_model(model_path, backend=INFERENCE_BACKEND):
+    """Muat tokenizer dan model `model_path` dengan backend yang dipilih."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend '{backend}' tidak dikenal. Pilihan: {', '.join(BACKENDS)}")
+
+    set_num_threads(_num_threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if backend == "onnx":
+        config, forward = _load_onnx_forward(model_path)
+        weights_hash = weights_fingerprint(onnx_dir_for(model_path))
+    else:
+        config, forward = _load_torch_forward(model_path, quantize=(backend == "int8"))
+        weights_hash = weights_fingerprint(model_path)
+    return SentimentModel(model_path, backend, tokenizer, config, forward, weights_hash)
@@ -0,0 +1,221 @@
+# File: metrics.py
+
+"""
+Instrumentasi ringan untuk app.py, crawler.py, dan checker.py.
+
+- `METRICS`: timer dan counter per stage (fetch, dedup, tokenize, forward,
+  insert, aggregation, ...) untuk proses ini. app.py menampilkannya di
+  `GET /metrics` dalam format teks Prometheus; crawler dan checker menulis
+  ringkasan JSON per run lewat `write_run_summary`.
+- `FORWARD_PROFILER`: profiler sampling opsional (`PROFILE_FORWARD=1`) untuk
+  jalur forward model. Stack thread yang sedang menjalankan forward diambil
+  setiap `PROFILE_INTERVAL_MS` dan disimpan dalam format *collapsed stack*
+  (bisa langsung dipakai flamegraph.pl / speedscope).
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- KONFIGURASI ---
+METRICS_PREFIX = "sentimen_"
+# Folder ringkasan JSON per run crawler/checker (kosongkan untuk hanya mencetak ke log)
+RUN_SUMMARY_DIR = os.getenv("RUN_SUMMARY_DIR", "./run_summaries")
+PROFILE_FORWARD = os.getenv("PROFILE_FORWARD", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "./forward_profile.txt")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+class Metrics:
+    """Counter dan timer (jumlah, total detik, maksimum) per nama + label, aman dipakai lintas thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._timers = {}
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def observe(self, name, seconds, **labels):
+        with self._lock:
+            timer = self._timers.setdefault((name, _label_key(labels)), [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """Semua metrik sebagai dict siap JSON: {"counters": {...}, "timers": {...}}."""
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {key: list(value) for key, value in self._timers.items()}
+        return {
+            "counters": {f"{name}{_format_labels(key)}": value for (name, key), value in sorted(counters.items())},
+            "timers": {
+                f"{name}{_format_labels(key)}": {
+                    "count": count,
+                    "total_seconds": round(total, 4),
+                    "avg_ms": round(total / count * 1000, 2) if count else 0.0,
+                    "max_ms": round(longest * 1000, 2),
+                }
+                for (name, key), (count, total, longest) in sorted(timers.items())
+            },
+        }
+
+    def to_prometheus(self, gauges=None):
+        """Format eksposisi teks Prometheus; `gauges` opsional berisi {nama: nilai} tambahan."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted((key, list(value)) for key, value in self._timers.items())
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, key), value in counters:
+            metric = f"{METRICS_PREFIX}{name}_total"
+            declare(metric, "counter")
+            lines.append(f"{metric}{_format_labels(key)} {value:g}")
+        # Baris satu metrik harus berurutan, jadi summary dan gauge _max ditulis per nama
+        for timer_name in sorted({name for (name, _), _ in timers}):
+            metric = f"{METRICS_PREFIX}{timer_name}_seconds"
+            rows = [(key, value) for (name, key), value in timers if name == timer_name]
+            declare(metric, "summary")
+            for key, (count, total, _) in rows:
+                lines.append(f"{metric}_count{_format_labels(key)} {count}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {total:.6f}")
+            declare(f"{metric}_max", "gauge")
+            for key, (_, _, longest) in rows:
+                lines.append(f"{metric}_max{_format_labels(key)} {longest:.6f}")
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{METRICS_PREFIX}{name}"
+            declare(metric, "gauge")
+            lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+# Registry bersama untuk seluruh modul di proses ini
+METRICS = Metrics()
+
+
+def write_run_summary(name, started_at, **fields):
+    """
+    Cetak ringkasan run (durasi, metrik, dan `fields`) sebagai satu baris JSON
+    dan simpan ke `RUN_SUMMARY_DIR/<name>_<waktu>.json`. Mengembalikan dict-nya.
+    """
+    finished_at = datetime.utcnow()
+    summary = {
+        "run": name,
+        "started_at": started_at.isoformat() + "Z",
+        "finished_at": finished_at.isoformat() + "Z",
+        "duration_seconds": round((finished_at - started_at).total_seconds(), 3),
+        **fields,
+        "metrics": METRICS.snapshot(),
+    }
+    if FORWARD_PROFILER.enabled:
+        summary["forward_profile"] = FORWARD_PROFILER.write()
+    print(f"📈 RUN_SUMMARY {json.dumps(summary, default=str)}")
+    if RUN_SUMMARY_DIR:
+        try:
+            os.makedirs(RUN_SUMMARY_DIR, exist_ok=True)
+            path = os.path.join(RUN_SUMMARY_DIR, f"{name}_{started_at:%Y%m%dT%H%M%S}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2, default=str)
+        except OSError as e:
+            print(f"⚠️ Gagal menulis ringkasan run: {e}")
+    return summary
+
+
+class SamplingProfiler:
+    """
+    Profiler sampling untuk kode di dalam `profile()`. Satu thread latar
+    mengambil stack thread-thread yang sedang berada di dalam blok tersebut
+    setiap `interval_ms`, sehingga overhead di jalur yang diprofil hanya dua
+    operasi set. Jika tidak aktif, `profile()` tidak melakukan apa-apa.
+    """
+
+    def __init__(self, enabled=PROFILE_FORWARD, interval_ms=PROFILE_INTERVAL_MS, output=PROFILE_OUTPUT):
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        self.output = output
+        self.samples = Counter()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextmanager
+    def profile(self):
+        if not self.enabled:
+            yield
+            return
+        self._ensure_sampler()
+        ident = threading.get_ident()
+        self._active.add(ident)
+        try:
+            yield
+        finally:
+            self._active.discard(ident)
+
+    def _ensure_sampler(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample_loop, name="forward-profiler", daemon=True)
+                self._thread.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for ident in list(self._active):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path=None):
+        """Tulis sampel dalam format collapsed stack; mengembalikan path dan jumlah sampel."""
+        path = path or self.output
+        with self._lock:
+            samples = self.samples.most_common()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples:
+                f.write(f"{stack} {count}\n")
+        return {"path": path, "samples": sum(count for _, count in samples)}
+
+
+FORWARD_PROFILER = SamplingProfiler()
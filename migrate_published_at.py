@@ -0,0 +1,118 @@
+# File: migrate_published_at.py
+
+"""
+Migrasi `published_at` lama (string ISO dari YouTube) menjadi Date.
+
+Sebelum crawler menyimpan `published_at` sebagai Date, nilainya berupa string.
+TTL index tidak pernah menghapus dokumen seperti itu, sehingga komentar lama
+tersimpan selamanya, dan semua query `$type: "date"` (rollup, indeks kata,
+checker, dashboard mode agregasi) melewatinya.
+
+PERUBAHAN RETENSI: setelah dimigrasi, TTL 2 hari (setup_ttl_index.py) berlaku
+untuk komentar ini. Komentar yang lebih tua dari 2 hari akan dihapus MongoDB
+dalam hitungan menit dan hanya tersisa di arsip Parquet (`ARCHIVE_URI`, lihat
+archiver.py) serta di hitungan rollup dan indeks kata.
+
+Per batch (urut `_id`): tulis ke arsip Parquet, catat di `counted_comments`,
+tambahkan ke rollup per jam dan indeks kata harian, lalu ubah nilainya dengan
+`$dateFromString`. Run yang terputus cukup diulang: komentar yang sudah
+tercatat tidak dihitung dua kali.
+
+    python migrate_published_at.py                 # arsip ke ARCHIVE_URI (default ./archive)
+    python migrate_published_at.py --skip-archive  # tanpa arsip: komentar lama hilang setelah TTL
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pymongo
+from dotenv import load_dotenv
+
+from rollup import COUNTED_COLLECTION_NAME, ROLLUP_COLLECTION_NAME, apply_rollup, ensure_counted_indexes, mark_counted
+from term_index import TERM_COLLECTION_NAME, apply_term_counts
+from youtube_fetcher import parse_published_at
+
+DB_NAME = "db_sentimen"
+COLLECTION_NAME = "netizen_comments"
+MIGRATION_BATCH_SIZE = 5000
+LEGACY_QUERY = {"published_at": {"$type": "string"}}
+
+
+def count_legacy(collection):
+    return collection.count_documents(LEGACY_QUERY)
+
+
+def migrate(db, archive_uri=None, batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Migrasikan semua dokumen dengan `published_at` string. Jika `archive_uri`
+    diisi, setiap batch diarsipkan lebih dulu. Mengembalikan (jumlah dokumen
+    yang diproses, jumlah yang baru dihitung ke rollup dan indeks kata).
+    """
+    archive_comments = None
+    if archive_uri:
+        from archiver import archive_comments
+
+    collection = db[COLLECTION_NAME]
+    counted = db[COUNTED_COLLECTION_NAME]
+    ensure_counted_indexes(counted)
+    processed = newly_counted = 0
+    last_id = None
+    while True:
+        query = dict(LEGACY_QUERY)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        # Urut `_id` agar string yang gagal diparse (tetap string) tidak dibaca berulang
+        docs = list(collection.find(query).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        if archive_comments is not None:
+            archive_comments(docs, archive_uri)
+
+        parsed = [{**doc, "published_at": parse_published_at(doc["published_at"])} for doc in docs]
+        parsed = [doc for doc in parsed if isinstance(doc["published_at"], datetime)]
+        to_count = mark_counted(counted, parsed)
+        apply_rollup(db[ROLLUP_COLLECTION_NAME], to_count)
+        apply_term_counts(db[TERM_COLLECTION_NAME], to_count)
+
+        ids = [doc["_id"] for doc in docs]
+        collection.update_many(
+            {"_id": {"$in": ids}, **LEGACY_QUERY},
+            [{"$set": {"published_at": {"$dateFromString": {"dateString": "$published_at", "onError": "$published_at"}}}}],
+        )
+        last_id = ids[-1]
+        processed += len(docs)
+        newly_counted += len(to_count)
+        print(f"   {processed:,} dokumen dimigrasi...")
+    return processed, newly_counted
+
+
+def main():
+    load_dotenv()
+    skip_archive = "--skip-archive" in sys.argv[1:]
+    archive_uri = None if skip_archive else os.getenv("ARCHIVE_URI", "./archive")
+    client = pymongo.MongoClient(os.getenv("MONGO_CONNECTION_STRING"))
+    try:
+        db = client[DB_NAME]
+        legacy = count_legacy(db[COLLECTION_NAME])
+        if not legacy:
+            print("✅ Tidak ada published_at bertipe string. Tidak ada yang perlu dimigrasi.")
+            return
+        print(f"🚀 Memigrasi {legacy:,} komentar dengan published_at bertipe string...")
+        if archive_uri:
+            print(f"   Komentar diarsipkan lebih dulu ke {archive_uri}.")
+        else:
+            print("⚠️ Tanpa arsip: komentar yang lebih tua dari 2 hari akan dihapus TTL setelah dimigrasi.")
+        processed, newly_counted = migrate(db, archive_uri)
+        remaining = count_legacy(db[COLLECTION_NAME])
+        print(f"✅ Migrasi selesai: {processed:,} dokumen diproses, {newly_counted:,} ditambahkan ke rollup dan indeks kata.")
+        if remaining:
+            print(f"⚠️ {remaining:,} dokumen tetap string karena tanggalnya tidak valid.")
+    except Exception as e:
+        print(f"❌ Gagal memigrasi published_at: {e}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# File: prediction_cache.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+# --- KONFIGURASI ---
+# Jumlah entri maksimum di cache memori (LRU)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+# Aktifkan tier persisten di MongoDB (koleksi terpisah) dengan nilai "1"
+PREDICTION_CACHE_PERSIST = os.getenv("PREDICTION_CACHE_PERSIST", "0") == "1"
+CACHE_COLLECTION_NAME = "prediction_cache"
+
+
+def normalize_text(text, lowercase=False):
+    """Normalisasi ringan yang tidak mengubah hasil tokenisasi model."""
+    text = " ".join(str(text).split())
+    return text.lower() if lowercase else text
+
+
+class PredictionCache:
+    """
+    Cache hasil prediksi berbasis hash teks yang sudah dinormalisasi.
+
+    Tier pertama adalah LRU di memori proses, tier kedua (opsional) adalah
+    koleksi MongoDB agar hasil bertahan antar-run crawler. Kunci cache selalu
+    menyertakan `namespace` (versi model + backend + max_length), sehingga
+    pergantian model tidak memakai hasil lama.
+    """
+
+    def __init__(self, namespace, max_size=PREDICTION_CACHE_SIZE, collection=None, lowercase=False):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.collection = collection
+        self.lowercase = lowercase
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def key_for(self, text):
+        normalized = normalize_text(text, self.lowercase)
+        return hashlib.sha1(f"{self.namespace}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    # --- Tier memori ---
+    def _memory_get(self, key):
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+            return result
+
+    def _memory_put(self, key, result):
+        with self._lock:
+            self._lru[key] = result
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    # --- Tier persisten ---
+    def _persistent_get_many(self, keys):
+        if self.collection is None or not keys:
+            return {}
+        try:
+            docs = self.collection.find({"_id": {"$in": list(keys)}}, {"sentiment": 1, "probabilities": 1})
+            return {doc["_id"]: {"sentiment": doc["sentiment"], "probabilities": doc.get("probabilities", {})} for doc in docs}
+        except Exception as e:
+            print(f"   [Peringatan] Gagal membaca cache prediksi: {e}")
+            return {}
+
+    def _persistent_put_many(self, items):
+        if self.collection is None or not items:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": key}, {"$setOnInsert": {**result, "namespace": self.namespace, "created_at": now}}, upsert=True)
+            for key, result in items.items()
+        ]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"   [Peringatan] Gagal menulis cache prediksi: {e}")
+
+    # --- API utama ---
+    def get(self, text):
+        key = self.key_for(text)
+        result = self._memory_get(key)
+        if result is not None:
+            self.memory_hits += 1
+            return result
+        result = self._persistent_get_many([key]).get(key)
+        if result is not None:
+            self.persistent_hits += 1
+            self._memory_put(key, result)
+            return result
+        self.misses += 1
+        return None
+
+    def put(self, text, result):
+        key = self.key_for(text)
+        self._memory_put(key, result)
+        self._persistent_put_many({key: result})
+
+    def predict(self, texts, predict_fn):
+        """
+        Kembalikan prediksi untuk `texts`, hanya memanggil `predict_fn` untuk
+        teks yang belum ada di cache. Duplikat dalam satu batch cukup
+        diprediksi sekali.
+        """
+        keys = [self.key_for(text) for text in texts]
+        found = {}
+        for key in set(keys):
+            result = self._memory_get(key)
+            if result is not None:
+                found[key] = result
+
+        persistent = self._persistent_get_many(set(keys) - found.keys())
+        for key, result in persistent.items():
+            self._memory_put(key, result)
+        found.update(persistent)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = dict(zip(missing.keys(), predict_fn(list(missing.values()))))
+            for key, result in computed.items():
+                self._memory_put(key, result)
+            self._persistent_put_many(computed)
+            found.update(computed)
+
+        # Statistik dihitung per teks input agar hit rate mencerminkan kerja yang dihemat
+        self.misses += len(missing)
+        self.persistent_hits += len(persistent)
+        self.memory_hits += len(texts) - len(missing) - len(persistent)
+        return [found[key] for key in keys]
+
+    @property
+    def hit_rate(self):
+        total = self.memory_hits + self.persistent_hits + self.misses
+        return (self.memory_hits + self.persistent_hits) / total if total else 0.0
+
+    def snapshot(self):
+        return {
+            "namespace": self.namespace,
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+def open_persistent_collection(client, db_name):
+    """Koleksi cache persisten, atau None jika tier persisten tidak diaktifkan."""
+    if not PREDICTION_CACHE_PERSIST or client is None:
+        return None
+    return client[db_name][CACHE_COLLECTION_NAME]
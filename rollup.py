@@ -0,0 +1,250 @@
+# File: rollup.py
+
+"""
+Rollup jumlah sentimen per jam (dan per video) di koleksi `sentiment_hourly`.
+
+Crawler menambah hitungan dengan `$inc` setiap kali menyimpan komentar baru,
+sehingga checker dan dashboard cukup membaca O(jam) dokumen rollup alih-alih
+memindai O(komentar) dokumen mentah.
+
+Komentar yang sudah dihitung dicatat di `counted_comments` (lihat
+`mark_counted`), sehingga komentar yang diambil ulang setelah dihapus TTL
+tidak ditambahkan dua kali ke rollup maupun indeks kata.
+
+Untuk mengisi rollup dari data yang sudah ada (hanya jam yang komentarnya
+belum tersentuh TTL, lihat `backfill`):
+    python rollup.py backfill
+"""
+
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+from setup_ttl_index import retention_start
+from topics import OTHER_TOPIC
+
+DB_NAME = "db_sentimen"
+COLLECTION_NAME = "netizen_comments"
+ROLLUP_COLLECTION_NAME = "sentiment_hourly"
+COUNTED_COLLECTION_NAME = "counted_comments"
+# Harus lebih lama dari SEARCH_PERIOD_DAYS crawler (30 hari): komentar hanya
+# diambil dari video yang masih masuk periode pencarian
+COUNTED_RETENTION_DAYS = 45
+
+
+def hour_bucket(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def ensure_rollup_indexes(rollup):
+    rollup.create_index([("hour", 1), ("video_id", 1)], unique=True, name="hour_video_unique")
+    rollup.create_index([("topic", 1), ("hour", 1)], name="topic_hour")
+
+
+def ensure_counted_indexes(counted):
+    counted.create_index("first_seen", expireAfterSeconds=COUNTED_RETENTION_DAYS * 24 * 3600, name="first_seen_ttl")
+
+
+def mark_counted(counted, docs):
+    """
+    Catat `comment_id` dokumen sebagai sudah dihitung. Mengembalikan dokumen
+    yang baru dicatat; yang sudah tercatat sebelumnya (ditolak `_id` ganda)
+    sudah masuk rollup dan indeks kata sehingga tidak boleh ditambahkan lagi.
+    """
+    if not docs:
+        return []
+    now = datetime.utcnow()
+    try:
+        counted.insert_many([{"_id": doc['comment_id'], "first_seen": now} for doc in docs], ordered=False)
+        return list(docs)
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != 11000 for err in write_errors):
+            raise
+        failed = {err['index'] for err in write_errors}
+        return [doc for i, doc in enumerate(docs) if i not in failed]
+
+
+def seed_counted(db):
+    """
+    Catat semua komentar di koleksi utama yang sudah masuk rollup (published_at
+    bertipe Date) sebagai sudah dihitung. Idempoten: catatan lama dipertahankan.
+    """
+    counted = db[COUNTED_COLLECTION_NAME]
+    ensure_counted_indexes(counted)
+    pipeline = [
+        {"$match": {"published_at": {"$type": "date"}}},
+        {"$project": {"_id": "$comment_id", "first_seen": {"$literal": datetime.utcnow()}}},
+        {"$merge": {"into": COUNTED_COLLECTION_NAME, "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}},
+    ]
+    db[COLLECTION_NAME].aggregate(pipeline, allowDiskUse=True)
+    return counted.count_documents({})
+
+
+def build_rollup_updates(docs):
+    """Kelompokkan dokumen per (jam, video) lalu ubah menjadi operasi `$inc`."""
+    counts = defaultdict(lambda: defaultdict(int))
+    topics = {}
+    for doc in docs:
+        published_at = doc.get('published_at')
+        sentiment = doc.get('sentiment')
+        if not isinstance(published_at, datetime) or not sentiment:
+            continue
+        counts[(hour_bucket(published_at), doc.get('video_id'))][sentiment] += 1
+        if doc.get('topic'):
+            topics[doc.get('video_id')] = doc['topic']
+
+    updates = []
+    for (hour, video_id), by_sentiment in counts.items():
+        inc = {f"counts.{sentiment}": n for sentiment, n in by_sentiment.items()}
+        inc["total"] = sum(by_sentiment.values())
+        update = {"$inc": inc}
+        if video_id in topics:
+            update["$set"] = {"topic": topics[video_id]}
+        updates.append(UpdateOne({"hour": hour, "video_id": video_id}, update, upsert=True))
+    return updates
+
+
+def apply_rollup(rollup, docs):
+    """Tambahkan dokumen yang baru disimpan ke rollup per jam."""
+    updates = build_rollup_updates(docs)
+    if updates:
+        rollup.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def window_counts(rollup, start, end, extra_match=None):
+    """Jumlah komentar per sentimen untuk jam-jam dalam [start, end)."""
+    match = {"hour": {"$gte": start, "$lt": end}}
+    if extra_match:
+        match.update(extra_match)
+    pipeline = [
+        {"$match": match},
+        {"$project": {"pairs": {"$objectToArray": "$counts"}}},
+        {"$unwind": "$pairs"},
+        {"$group": {"_id": "$pairs.k", "count": {"$sum": "$pairs.v"}}},
+    ]
+    return {doc["_id"]: doc["count"] for doc in rollup.aggregate(pipeline)}
+
+
+def segment_window_counts(rollup, baseline_start, current_start, end):
+    """
+    Hitungan sentimen jendela saat ini [current_start, end) dan pembanding
+    [baseline_start, current_start) untuk keseluruhan data, per topik, dan per
+    video, dalam satu aggregation (`$facet`). Hasil berbentuk
+    {"global": {None: w}, "topic": {topik: w}, "video": {video_id: w}} dengan
+    w = {"current": {sentimen: n}, "baseline": {sentimen: n}}.
+    """
+    def by(key):
+        return [{"$group": {"_id": {"key": key, "window": "$window", "sentiment": "$pairs.k"}, "count": {"$sum": "$pairs.v"}}}]
+
+    pipeline = [
+        {"$match": {"hour": {"$gte": baseline_start, "$lt": end}}},
+        {"$project": {
+            "video_id": 1,
+            "topic": {"$ifNull": ["$topic", OTHER_TOPIC]},
+            "window": {"$cond": [{"$gte": ["$hour", current_start]}, "current", "baseline"]},
+            "pairs": {"$objectToArray": "$counts"},
+        }},
+        {"$unwind": "$pairs"},
+        {"$facet": {"global": by(None), "topic": by("$topic"), "video": by("$video_id")}},
+    ]
+    result = {}
+    for facet, rows in next(rollup.aggregate(pipeline, allowDiskUse=True), {}).items():
+        segments = result.setdefault(facet, {})
+        for row in rows:
+            windows = segments.setdefault(row["_id"].get("key"), {"current": {}, "baseline": {}})
+            windows[row["_id"]["window"]][row["_id"]["sentiment"]] = row["count"]
+    for facet in ("global", "topic", "video"):
+        result.setdefault(facet, {})
+    return result
+
+
+def daily_counts(rollup, start, end, sentiment=None):
+    """Baris (tanggal, sentimen, jumlah) dari rollup untuk rentang [start, end)."""
+    pipeline = [
+        {"$match": {"hour": {"$gte": start, "$lt": end}}},
+        {"$project": {"tanggal": {"$dateToString": {"format": "%Y-%m-%d", "date": "$hour"}}, "pairs": {"$objectToArray": "$counts"}}},
+        {"$unwind": "$pairs"},
+    ]
+    if sentiment:
+        pipeline.append({"$match": {"pairs.k": sentiment}})
+    pipeline.append({"$group": {"_id": {"tanggal": "$tanggal", "sentiment": "$pairs.k"}, "count": {"$sum": "$pairs.v"}}})
+    return [{"tanggal": doc["_id"]["tanggal"], "sentiment": doc["_id"]["sentiment"], "count": doc["count"]}
+            for doc in rollup.aggregate(pipeline)]
+
+
+def first_retained_hour(now=None):
+    """Jam pertama yang komentarnya masih utuh di koleksi (belum tersentuh TTL)."""
+    return hour_bucket(retention_start(now)) + timedelta(hours=1)
+
+
+def backfill(db, since=None):
+    """
+    Hitung ulang rollup dari koleksi komentar mentah (idempoten: jam yang
+    sudah ada diganti dengan hasil hitungan terbaru). Hanya jam sejak
+    `first_retained_hour` yang dihitung ulang, karena jam yang lebih lama sudah
+    sebagian atau seluruhnya dihapus TTL dan hitungannya di rollup lebih lengkap.
+    Mengembalikan (jam awal yang dihitung ulang, jumlah dokumen rollup).
+    """
+    rollup = db[ROLLUP_COLLECTION_NAME]
+    ensure_rollup_indexes(rollup)
+    since = max(hour_bucket(since), first_retained_hour()) if since else first_retained_hour()
+    match = {"published_at": {"$gte": since}, "sentiment": {"$type": "string"}}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "hour": {"$dateFromParts": {
+                    "year": {"$year": "$published_at"}, "month": {"$month": "$published_at"},
+                    "day": {"$dayOfMonth": "$published_at"}, "hour": {"$hour": "$published_at"},
+                }},
+                "video_id": "$video_id",
+                "sentiment": "$sentiment",
+            },
+            "n": {"$sum": 1},
+            "topic": {"$max": "$topic"},
+        }},
+        {"$group": {
+            "_id": {"hour": "$_id.hour", "video_id": "$_id.video_id"},
+            "pairs": {"$push": {"k": "$_id.sentiment", "v": "$n"}},
+            "total": {"$sum": "$n"},
+            "topic": {"$max": "$topic"},
+        }},
+        {"$project": {
+            "_id": 0, "hour": "$_id.hour", "video_id": "$_id.video_id", "counts": {"$arrayToObject": "$pairs"}, "total": 1,
+            "topic": {"$ifNull": ["$topic", OTHER_TOPIC]},
+        }},
+        {"$merge": {"into": ROLLUP_COLLECTION_NAME, "on": ["hour", "video_id"], "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    db[COLLECTION_NAME].aggregate(pipeline, allowDiskUse=True)
+    return since, rollup.count_documents({})
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Penggunaan: python rollup.py backfill [jumlah_hari_terakhir]")
+        sys.exit(1)
+
+    load_dotenv()
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    print("🚀 Menghitung ulang rollup sentimen per jam...")
+    client = pymongo.MongoClient(os.getenv("MONGO_CONNECTION_STRING"))
+    try:
+        since, total = backfill(client[DB_NAME], since)
+        print(f"✅ Rollup sejak {since:%Y-%m-%d %H:00} UTC dihitung ulang. Koleksi '{ROLLUP_COLLECTION_NAME}' berisi {total} dokumen (jam x video).")
+    except Exception as e:
+        print(f"❌ Gagal menghitung rollup: {e}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
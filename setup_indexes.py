@@ -0,0 +1,87 @@
+# File: setup_indexes.py
+
+import os
+import pymongo
+from dotenv import load_dotenv
+
+from rollup import COUNTED_COLLECTION_NAME, ROLLUP_COLLECTION_NAME, ensure_rollup_indexes, seed_counted
+from term_index import TERM_COLLECTION_NAME, ensure_term_indexes
+
+# --- KONFIGURASI ---
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
+DB_NAME = "db_sentimen"
+COLLECTION_NAME = "netizen_comments"
+
+
+def remove_duplicate_comments(collection):
+    """
+    Hapus dokumen ganda per `comment_id` (sisakan satu) agar unique index
+    bisa dibuat pada koleksi lama yang belum pernah dideduplikasi.
+    """
+    pipeline = [
+        {"$group": {"_id": "$comment_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    removed = 0
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        result = collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    return removed
+
+
+def create_indexes():
+    """
+    Fungsi untuk membuat index pendukung crawler pada koleksi MongoDB.
+    Aman dijalankan berulang kali (idempoten).
+    """
+    print("🚀 Mencoba membuat index...")
+    client = None
+    try:
+        client = pymongo.MongoClient(MONGO_URI)
+        db = client[DB_NAME]
+        collection = db[COLLECTION_NAME]
+
+        removed = remove_duplicate_comments(collection)
+        if removed:
+            print(f"   Menghapus {removed} dokumen ganda sebelum membuat unique index.")
+
+        # Unique index pada 'comment_id': dedup crawler cukup mengecek ID kandidat
+        # per batch dengan $in, dan insert ganda ditolak oleh database
+        collection.create_index("comment_id", unique=True, name="comment_id_unique")
+        print(f"✅ Berhasil membuat atau mengonfirmasi unique index 'comment_id' pada '{COLLECTION_NAME}'.")
+
+        # Paginasi tabel data lengkap & komentar populer di dashboard: urutan
+        # (published_at, _id) dan (like_count, _id), dengan atau tanpa filter sentimen
+        for sort_field in ("published_at", "like_count"):
+            collection.create_index([(sort_field, -1), ("_id", -1)], name=f"{sort_field}_id")
+            collection.create_index([("sentiment", 1), (sort_field, -1), ("_id", -1)], name=f"sentiment_{sort_field}_id")
+        print(f"✅ Berhasil membuat atau mengonfirmasi index pengurutan dashboard pada '{COLLECTION_NAME}'.")
+
+        # Komentar per topik dalam rentang waktu (filter/drill-down per topik)
+        collection.create_index([("topic", 1), ("published_at", 1)], name="topic_published_at")
+        print(f"✅ Berhasil membuat atau mengonfirmasi index (topic, published_at) pada '{COLLECTION_NAME}'.")
+
+        # Rollup per jam: satu dokumen per (jam, video), dibaca berdasarkan rentang jam
+        # (keseluruhan maupun per topik)
+        ensure_rollup_indexes(db[ROLLUP_COLLECTION_NAME])
+        print(f"✅ Berhasil membuat atau mengonfirmasi index (hour, video_id) dan (topic, hour) pada '{ROLLUP_COLLECTION_NAME}'.")
+
+        # Komentar yang sudah dihitung: dedup crawler dan penjaga `$inc` rollup/indeks
+        # kata, termasuk untuk komentar yang sudah dihapus TTL lalu diambil ulang
+        seeded = seed_counted(db)
+        print(f"✅ Berhasil mengisi '{COUNTED_COLLECTION_NAME}' ({seeded} komentar) dan membuat TTL index 'first_seen'.")
+
+        # Indeks kata harian: upsert per (hari, sentimen, n, term), dibaca per rentang hari
+        ensure_term_indexes(db[TERM_COLLECTION_NAME])
+        print(f"✅ Berhasil membuat atau mengonfirmasi index pada '{TERM_COLLECTION_NAME}'.")
+
+    except Exception as e:
+        print(f"❌ Gagal membuat index: {e}")
+    finally:
+        if client:
+            client.close()
+
+
+if __name__ == "__main__":
+    create_indexes()
@@ -1,6 +1,8 @@
 # File: setup_ttl_index.py
 
 import os
+from datetime import datetime, timedelta
+
 import pymongo
 from dotenv import load_dotenv
 
@@ -11,6 +13,11 @@ DB_NAME = "db_sentimen"
 COLLECTION_NAME = "netizen_comments"
 EXPIRE_AFTER_SECONDS = 172800  # 2 hari = 2 * 24 * 60 * 60 detik
 
+
+def retention_start(now=None):
+    """Komentar dengan published_at sebelum waktu ini mungkin sudah dihapus TTL."""
+    return (now or datetime.utcnow()) - timedelta(seconds=EXPIRE_AFTER_SECONDS)
+
 def create_ttl_index():
     """
     Fungsi untuk membuat TTL Index pada koleksi MongoDB.
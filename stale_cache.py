@@ -0,0 +1,98 @@
+# File: stale_cache.py
+
+"""
+Cache *stale-while-revalidate* untuk loader dashboard.
+
+Berbeda dengan `st.cache_data(ttl=...)` yang membuat pengguna pertama setelah
+TTL habis menunggu query ulang, nilai yang kedaluwarsa tetap dikembalikan
+seketika dan query ulang dijalankan di thread latar. Pengguna hanya menunggu
+jika belum ada nilai sama sekali untuk argumen tersebut.
+
+Streamlit menjalankan ulang dashboard.py di setiap interaksi, jadi penyimpanan
+nilai berada di modul ini (tetap hidup selama proses server berjalan) dan
+dikunci per nama fungsi, dibagi oleh semua sesi pengguna. Nilai yang
+dikembalikan tidak disalin, jadi pemanggil tidak boleh mengubahnya.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 64
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Store:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fn = None
+        self.entries = OrderedDict()  # argumen -> (nilai, waktu dimuat)
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        value = self.fn(*key)
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def refresh(self, key):
+        try:
+            self.load(key)
+        except Exception as e:
+            # Nilai lama tetap dipakai; percobaan berikutnya pada akses selanjutnya
+            print(f"⚠️ Refresh latar {self.fn.__name__}{key} gagal: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                value, loaded_at = entry
+                if time.monotonic() - loaded_at < self.ttl or key in self.refreshing:
+                    return value
+                self.refreshing.add(key)
+        if entry is None:
+            return self.load(key)
+        threading.Thread(target=self.refresh, args=(key,), name=f"refresh-{self.fn.__name__}", daemon=True).start()
+        return value
+
+
+def stale_while_revalidate(ttl, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Dekorator untuk loader dengan argumen hashable. Setelah `ttl` detik, nilai
+    lama tetap dikembalikan sementara nilai baru dimuat di latar. Loader harus
+    melempar exception saat gagal (bukan mengembalikan nilai kosong) agar nilai
+    lama dipertahankan; exception hanya sampai ke pemanggil saat belum ada nilai.
+    """
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        with _stores_lock:
+            store = _stores.setdefault(name, _Store(ttl, max_entries))
+        # Definisi fungsi terbaru (dari rerun skrip) yang dipakai untuk refresh
+        store.fn = fn
+
+        def wrapper(*args):
+            return store.get(args)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorator
+
+
+def clear_all():
+    """Buang semua nilai (tombol Refresh Data): pemanggilan berikutnya memuat ulang."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        with store.lock:
+            store.entries.clear()
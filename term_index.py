@@ -0,0 +1,149 @@
+# File: term_index.py
+
+"""
+Indeks frekuensi kata (unigram) dan frasa dua kata (bigram) per hari per
+sentimen di koleksi `term_daily`.
+
+Crawler menambah hitungan dengan `$inc` setiap kali menyimpan komentar, jadi
+panel "Topik Utama Komentar Negatif" dan word cloud di dashboard cukup
+menjumlahkan bucket harian untuk rentang tanggal yang dipilih, tanpa
+men-tokenize ulang seluruh komentar.
+
+Untuk membangun ulang hari-hari yang komentarnya belum tersentuh TTL:
+    python term_index.py backfill [jumlah_hari_terakhir]
+"""
+
+import os
+import re
+import sys
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+import pymongo
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+from setup_ttl_index import retention_start
+
+DB_NAME = "db_sentimen"
+COLLECTION_NAME = "netizen_comments"
+TERM_COLLECTION_NAME = "term_daily"
+BACKFILL_BATCH_SIZE = 2000
+
+# Sama dengan stop words dan token_pattern bawaan CountVectorizer yang dipakai dashboard
+STOP_WORDS = ['di', 'dan', 'yang', 'ini', 'itu', 'ke', 'dari', 'dengan', 'untuk']
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def ensure_term_indexes(terms):
+    terms.create_index([("day", 1), ("sentiment", 1), ("n", 1), ("term", 1)], unique=True, name="day_sentiment_n_term_unique")
+    terms.create_index([("sentiment", 1), ("n", 1), ("day", 1)], name="sentiment_n_day")
+
+
+def extract_terms(text):
+    """
+    Unigram (semua token) dan bigram (setelah stop words dibuang, seperti
+    CountVectorizer(ngram_range=(2, 2), stop_words=STOP_WORDS)).
+    """
+    tokens = TOKEN_PATTERN.findall(str(text).lower())
+    content = [t for t in tokens if t not in STOP_WORDS]
+    bigrams = [f"{a} {b}" for a, b in zip(content, content[1:])]
+    return tokens, bigrams
+
+
+def count_terms(docs):
+    """Hitung frekuensi (hari, sentimen, n, term) dari sekumpulan dokumen komentar."""
+    counts = Counter()
+    for doc in docs:
+        published_at = doc.get('published_at')
+        sentiment = doc.get('sentiment')
+        if not isinstance(published_at, datetime) or not sentiment or not doc.get('comment'):
+            continue
+        day = datetime.combine(published_at.date(), time.min)
+        unigrams, bigrams = extract_terms(doc['comment'])
+        for term in unigrams:
+            counts[(day, sentiment, 1, term)] += 1
+        for term in bigrams:
+            counts[(day, sentiment, 2, term)] += 1
+    return counts
+
+
+def apply_term_counts(terms, docs):
+    """Tambahkan komentar yang baru disimpan ke indeks kata harian."""
+    counts = count_terms(docs)
+    if not counts:
+        return 0
+    updates = [
+        UpdateOne({"day": day, "sentiment": sentiment, "n": n, "term": term}, {"$inc": {"count": count}}, upsert=True)
+        for (day, sentiment, n, term), count in counts.items()
+    ]
+    terms.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def top_terms(terms, start, end, sentiment, n, top_k):
+    """Term terbanyak untuk hari-hari dalam [start, end), hasil penjumlahan bucket harian."""
+    pipeline = [
+        {"$match": {"sentiment": sentiment, "n": n, "day": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": "$term", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": top_k},
+    ]
+    return [(doc["_id"], doc["count"]) for doc in terms.aggregate(pipeline, allowDiskUse=True)]
+
+
+def first_retained_day(now=None):
+    """Hari pertama yang komentarnya masih utuh di koleksi (belum tersentuh TTL)."""
+    return datetime.combine(retention_start(now).date() + timedelta(days=1), time.min)
+
+
+def backfill(db, since=None):
+    """
+    Bangun ulang indeks kata dari koleksi komentar. Bucket untuk hari-hari yang
+    dihitung ulang dihapus dulu agar hasilnya tidak terhitung ganda. Hanya hari
+    sejak `first_retained_day` yang dibangun ulang: hari yang lebih lama sudah
+    (sebagian) dihapus TTL, jadi bucket hasil `$inc` crawler dipertahankan.
+    Mengembalikan (hari awal yang dibangun ulang, jumlah komentar yang diproses).
+    """
+    terms = db[TERM_COLLECTION_NAME]
+    ensure_term_indexes(terms)
+    since = datetime.combine(since.date(), time.min) if since else None
+    since = max(since, first_retained_day()) if since else first_retained_day()
+    match = {"published_at": {"$gte": since}, "sentiment": {"$type": "string"}}
+    terms.delete_many({"day": {"$gte": since}})
+
+    cursor = db[COLLECTION_NAME].find(match, {"_id": 0, "comment": 1, "sentiment": 1, "published_at": 1}, batch_size=BACKFILL_BATCH_SIZE)
+    batch, processed = [], 0
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            apply_term_counts(terms, batch)
+            processed += len(batch)
+            batch = []
+    if batch:
+        apply_term_counts(terms, batch)
+        processed += len(batch)
+    return since, processed
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Penggunaan: python term_index.py backfill [jumlah_hari_terakhir]")
+        sys.exit(1)
+
+    load_dotenv()
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    print("🚀 Membangun ulang indeks kata harian...")
+    client = pymongo.MongoClient(os.getenv("MONGO_CONNECTION_STRING"))
+    try:
+        since, processed = backfill(client[DB_NAME], since)
+        print(f"✅ Indeks kata sejak {since:%Y-%m-%d} dibangun ulang dari {processed} komentar.")
+    except Exception as e:
+        print(f"❌ Gagal membangun indeks kata: {e}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
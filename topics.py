@@ -0,0 +1,31 @@
+# File: topics.py
+
+"""
+Daftar topik yang dipantau. Setiap kunci juga menjadi frasa pencarian video
+di crawler, dan kata kuncinya dipakai untuk menandai video (dari judul dan
+deskripsi hasil pencarian) sehingga setiap komentar membawa field `topic`.
+"""
+
+TOPICS = {
+    "tunjangan dpr": ["tunjangan dpr", "tunjangan", "gaji dpr"],
+    "demo dpr": ["demo dpr", "aksi dpr", "unjuk rasa"],
+    "demo rusuh indonesia": ["demo rusuh", "rusuh", "ricuh", "kerusuhan"],
+    "bubarkan dpr": ["bubarkan dpr", "bubarin dpr"],
+    "perampasan aset": ["perampasan aset", "ruu perampasan", "rampas aset"],
+}
+# Video yang tidak cocok dengan kata kunci mana pun (atau komentar lama tanpa topik)
+OTHER_TOPIC = "lainnya"
+
+
+def search_query():
+    """Query pencarian YouTube: semua frasa topik digabung dengan OR."""
+    return " | ".join(f'"{topic}"' for topic in TOPICS)
+
+
+def classify_topic(text):
+    """Topik pertama yang kata kuncinya muncul di `text`, atau OTHER_TOPIC."""
+    text = (text or "").lower()
+    for topic, keywords in TOPICS.items():
+        if any(keyword in text for keyword in keywords):
+            return topic
+    return OTHER_TOPIC
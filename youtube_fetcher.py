@@ -0,0 +1,344 @@
+# File: youtube_fetcher.py
+
+import os
+import time
+import random
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+from pymongo import UpdateOne
+
+from metrics import METRICS
+
+# --- KONFIGURASI ---
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))           # Jumlah video yang di-paging paralel
+YOUTUBE_RPS = float(os.getenv("YOUTUBE_RPS", "5"))             # Batas request per detik ke YouTube API
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))  # Anggaran unit kuota harian
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+
+# Biaya unit kuota per jenis request (lihat dokumentasi YouTube Data API v3)
+SEARCH_COST = 100
+COMMENT_THREADS_COST = 1
+
+# Kuota YouTube di-reset setiap tengah malam waktu Pasifik
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+QUOTA_COLLECTION_NAME = "api_quota"
+CRAWL_STATE_COLLECTION_NAME = "crawl_state"
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "backendError")
+
+
+class QuotaExceeded(Exception):
+    """Anggaran kuota harian habis (lokal maupun dari YouTube)."""
+
+
+class RateLimiter:
+    """Token bucket sederhana yang aman dipakai banyak thread."""
+
+    def __init__(self, rate_per_second=YOUTUBE_RPS, burst=None):
+        self.rate = max(rate_per_second, 0.001)
+        self.capacity = burst or max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class QuotaTracker:
+    """
+    Menghitung pemakaian unit kuota harian lintas request dan lintas run.
+
+    Pemakaian hari ini dibaca dari koleksi `api_quota` saat mulai (jika
+    koleksi diberikan) dan ditambahkan kembali lewat `flush()` di akhir run.
+    """
+
+    def __init__(self, budget=YOUTUBE_DAILY_QUOTA, collection=None):
+        self.budget = budget
+        self.collection = collection
+        self.day = datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+        self.used_before = 0
+        self.used = 0
+        self._lock = threading.Lock()
+        if collection is not None:
+            doc = collection.find_one({"_id": self.day})
+            self.used_before = doc.get("units", 0) if doc else 0
+
+    @property
+    def remaining(self):
+        return self.budget - self.used_before - self.used
+
+    def consume(self, units):
+        with self._lock:
+            if self.used_before + self.used + units > self.budget:
+                raise QuotaExceeded(f"Anggaran kuota harian ({self.budget} unit) habis")
+            self.used += units
+
+    def flush(self):
+        if self.collection is None or not self.used:
+            return
+        self.collection.update_one({"_id": self.day}, {"$inc": {"units": self.used}}, upsert=True)
+        self.used_before += self.used
+        self.used = 0
+
+
+class CrawlState:
+    """
+    Watermark paging per video, disimpan di koleksi `crawl_state`.
+
+    `watermark` adalah waktu komentar terbaru yang sudah tersimpan beserta
+    semua komentar sebelumnya. Jika run terhenti di tengah paging (target
+    atau kuota habis), `resume_token` menandai halaman berikutnya yang belum
+    diambil dan `gap_top` waktu komentar terbaru yang sudah diambil: run
+    berikutnya mengambil komentar baru sampai `gap_top`, lalu melanjutkan
+    dari `resume_token` sampai `watermark`.
+
+    Perubahan hanya ditulis lewat `flush()`, yaitu setelah komentar yang
+    diambil benar-benar tersimpan.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self._states = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def load(self, video_ids):
+        if self.collection is None:
+            return
+        for doc in self.collection.find({"_id": {"$in": list(video_ids)}}):
+            self._states[doc["_id"]] = doc
+
+    def get(self, video_id):
+        with self._lock:
+            return dict(self._states.get(video_id) or {})
+
+    def update(self, video_id, **fields):
+        fields["last_crawled_at"] = datetime.utcnow()
+        with self._lock:
+            self._states.setdefault(video_id, {"_id": video_id}).update(fields)
+            self._dirty.add(video_id)
+
+    def flush(self):
+        with self._lock:
+            if self.collection is None or not self._dirty:
+                return 0
+            operations = [
+                UpdateOne({"_id": video_id}, {"$set": {k: v for k, v in self._states[video_id].items() if k != "_id"}}, upsert=True)
+                for video_id in self._dirty
+            ]
+            self._dirty.clear()
+        self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+
+def _is_retryable(error):
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, "status", None)
+        return status in RETRYABLE_STATUS or any(reason in str(error) for reason in RETRYABLE_REASONS)
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+def execute_with_retry(request, limiter, quota, cost):
+    """Jalankan request API dengan rate limit, pencatatan kuota, dan retry + backoff."""
+    for attempt in range(MAX_RETRIES + 1):
+        quota.consume(cost)
+        limiter.acquire()
+        try:
+            with METRICS.timer("stage", stage="youtube_api"):
+                return request.execute()
+        except Exception as e:
+            METRICS.inc("youtube_api_errors")
+            if isinstance(e, HttpError) and ("quotaExceeded" in str(e) or "dailyLimitExceeded" in str(e)):
+                raise QuotaExceeded("Kuota YouTube API harian telah habis") from e
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            time.sleep(BACKOFF_BASE_SECONDS * (2 ** attempt) + random.uniform(0, BACKOFF_BASE_SECONDS))
+
+
+def parse_published_at(value):
+    """Ubah timestamp ISO dari YouTube ('...Z') menjadi datetime UTC naif."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return value
+
+
+def parse_comment(item, video_id):
+    comment_snippet = item['snippet']['topLevelComment']['snippet']
+    return {
+        'comment_id': item['id'],
+        'author': comment_snippet.get('authorDisplayName'),
+        'comment': comment_snippet.get('textDisplay'),
+        'published_at': parse_published_at(comment_snippet.get('publishedAt')),
+        'like_count': comment_snippet.get('likeCount', 0),
+        'video_id': video_id,
+    }
+
+
+def _older_than(comment, stop_at):
+    published_at = comment['published_at']
+    return stop_at is not None and isinstance(published_at, datetime) and published_at < stop_at
+
+
+class CommentFetcher:
+    """
+    Mengambil komentar dari banyak video secara paralel.
+
+    `client_factory` dipanggil sekali per thread karena objek klien
+    googleapiclient tidak thread-safe. Komentar diambil dari yang terbaru
+    (order='time') dan paging sebuah video berhenti begitu mencapai watermark
+    di `state`. Setiap halaman komentar diteruskan ke `on_page(comments)`;
+    pengambilan berhenti begitu `target_count` tercapai atau kuota habis.
+    """
+
+    def __init__(self, client_factory, target_count, workers=FETCH_WORKERS, limiter=None, quota=None, state=None):
+        self.client_factory = client_factory
+        self.target_count = target_count
+        self.workers = max(1, workers)
+        self.limiter = limiter or RateLimiter()
+        self.quota = quota or QuotaTracker()
+        self.state = state or CrawlState()
+        self.collected = 0
+        self.pages = 0
+        self.caught_up_videos = 0
+        self.failed_videos = []
+        self.quota_exhausted = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.client_factory()
+        return self._local.client
+
+    def stop(self):
+        """Hentikan pengambilan halaman berikutnya (mis. karena stage hilir gagal)."""
+        self._stop.set()
+
+    def _reserve(self, count):
+        """Ambil jatah komentar dari target global; kembalikan jumlah yang boleh disimpan."""
+        with self._lock:
+            allowed = max(0, min(count, self.target_count - self.collected))
+            self.collected += allowed
+            self.pages += 1
+            if self.collected >= self.target_count:
+                self._stop.set()
+            return allowed
+
+    def _fetch_segment(self, youtube, video_id, page_token, stop_at, on_page, progress):
+        """
+        Paging dari `page_token` sampai bertemu komentar yang lebih lama dari
+        `stop_at`. Mengembalikan True jika segmen tuntas, False jika terhenti;
+        `progress['token']` lalu menunjuk halaman pertama yang belum tersimpan utuh.
+        """
+        progress["token"] = page_token
+        while not self._stop.is_set():
+            request = youtube.commentThreads().list(
+                part='snippet', videoId=video_id, maxResults=100, textFormat='plainText', order='time', pageToken=page_token,
+            )
+            response = execute_with_retry(request, self.limiter, self.quota, COMMENT_THREADS_COST)
+            progress["pages"] += 1
+            comments = [parse_comment(item, video_id) for item in response.get('items', [])]
+            fresh = [c for c in comments if not _older_than(c, stop_at)]
+            allowed = self._reserve(len(fresh))
+            if allowed:
+                on_page(fresh[:allowed])
+                times = [c['published_at'] for c in fresh[:allowed] if isinstance(c['published_at'], datetime)]
+                if times and (progress["newest"] is None or max(times) > progress["newest"]):
+                    progress["newest"] = max(times)
+            if allowed < len(fresh):
+                return False
+            page_token = response.get('nextPageToken')
+            if len(fresh) < len(comments) or not page_token:
+                return True
+            progress["token"] = page_token
+        return False
+
+    def fetch_video(self, video_id, on_page):
+        youtube = self._client()
+        state = self.state.get(video_id)
+        watermark, gap_top, resume_token = state.get("watermark"), state.get("gap_top"), state.get("resume_token")
+        # Segmen 1: komentar baru dari atas. Segmen 2 (jika ada): celah yang ditinggalkan run sebelumnya
+        segments = [(None, (gap_top or watermark) if resume_token else watermark)]
+        if resume_token:
+            segments.append((resume_token, watermark))
+
+        progress = {"newest": None, "token": None, "pages": 0}
+        try:
+            for index, (page_token, stop_at) in enumerate(segments):
+                try:
+                    completed = self._fetch_segment(youtube, video_id, page_token, stop_at, on_page, progress)
+                except HttpError as e:
+                    # Page token lama bisa kedaluwarsa: ulangi dari atas sampai watermark
+                    if index == 0 or getattr(e.resp, "status", None) != 400:
+                        raise
+                    completed = self._fetch_segment(youtube, video_id, None, watermark, on_page, progress)
+                if not completed:
+                    self._record_gap(video_id, state, progress)
+                    return
+        except Exception:
+            self._record_gap(video_id, state, progress)
+            raise
+
+        newest = max((t for t in (progress["newest"], gap_top, watermark) if t is not None), default=None)
+        self.state.update(video_id, watermark=newest, gap_top=None, resume_token=None)
+        with self._lock:
+            self.caught_up_videos += 1
+
+    def _record_gap(self, video_id, state, progress):
+        if not progress["pages"]:
+            return
+        if progress["token"] is None:
+            # Terhenti di halaman pertama: run berikutnya cukup mulai lagi dari atas sampai watermark
+            self.state.update(video_id, gap_top=None, resume_token=None)
+        else:
+            self.state.update(video_id, gap_top=progress["newest"] or state.get("gap_top"), resume_token=progress["token"])
+
+    def _fetch_video_safe(self, video_id, on_page):
+        if self._stop.is_set():
+            return
+        try:
+            self.fetch_video(video_id, on_page)
+        except QuotaExceeded as e:
+            with self._lock:
+                already_reported, self.quota_exhausted = self.quota_exhausted, True
+            if not already_reported:
+                print(f"   ❌ {e}. Pengambilan komentar dihentikan.")
+            self._stop.set()
+        except Exception as e:
+            print(f"   [Peringatan] Gagal mengambil komentar dari video {video_id}: {e}")
+            self.failed_videos.append(video_id)
+
+    def run(self, video_ids, on_page):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="yt-fetch") as pool:
+            for video_id in video_ids:
+                pool.submit(self._fetch_video_safe, video_id, on_page)
+
+    def fetch_all(self, video_ids):
+        """Kumpulkan semua komentar ke dalam satu list."""
+        comments = []
+        lock = threading.Lock()
+
+        def on_page(page):
+            with lock:
+                comments.extend(page)
+
+        self.run(video_ids, on_page)
+        return comments